@@ -2,7 +2,9 @@ import os
 import asyncio
 import uuid
 import logging
+import multiprocessing
 import threading
+import time
 import requests
 from pathlib import Path
 from flask import Flask, jsonify, send_from_directory, request
@@ -10,9 +12,19 @@ from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
 from config import config
-from web_scraper import scrape_and_save_url
-from pdf_processor import process_pdf
-from vector_db import add_document_to_webui
+from web_scraper import WebScraper, ScrapedPage
+from http_session import DownloadRejected, check_response_headers, session_manager
+from crawler import Crawler
+from feed_reader import FeedReader
+from content_index import content_index
+from job_queue import job_queue
+from pdf_processor import DuplicateDocument, process_pdf
+from vector_db import add_document_to_webui, webui_client
+from file_index import file_index
+from embedding_engine import embedding_engine
+from hybrid_search import SEARCH_MODES, hybrid_search
+from bm25_index import bm25_index
+from chunker import chunk_file
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,49 +37,145 @@ config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 def download_and_process_pdf(pdf_url: str) -> Path | None:
     """Downloads a PDF from a URL, saves it, processes it, and returns the output path."""
+    temp_path = config.OUTPUT_DIR / f"temp_{uuid.uuid4()}.pdf"
     try:
-        response = requests.get(pdf_url, stream=True, timeout=30)
-        response.raise_for_status()
-
-        original_filename = secure_filename(Path(pdf_url).name) or "downloaded.pdf"
-        if not original_filename.endswith('.pdf'):
-            original_filename += '.pdf'
-
-        temp_path = config.OUTPUT_DIR / f"temp_{uuid.uuid4()}.pdf"
-        with open(temp_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with requests.get(pdf_url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            # Refuse from the headers alone when possible, then enforce the cap while streaming
+            check_response_headers(pdf_url, response.headers, config.PDF_CONTENT_TYPES, config.MAX_PDF_BYTES)
+
+            original_filename = secure_filename(Path(pdf_url).name) or "downloaded.pdf"
+            if not original_filename.endswith('.pdf'):
+                original_filename += '.pdf'
+
+            size = 0
+            with open(temp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=config.DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > config.MAX_PDF_BYTES:
+                        raise DownloadRejected(f"{pdf_url} exceeded the {config.MAX_PDF_BYTES} byte limit while downloading")
+                    f.write(chunk)
 
         logger.info(f"Temporarily saved downloaded PDF to {temp_path}")
         return process_pdf(temp_path, original_filename)
+    except DownloadRejected as e:
+        logger.warning(f"Skipping PDF: {e}")
+    except DuplicateDocument as e:
+        logger.info(f"Skipping PDF: {e}")
     except requests.RequestException as e:
         logger.error(f"Failed to download PDF from {pdf_url}: {e}")
     except Exception as e:
         logger.error(f"Error processing PDF from {pdf_url}: {e}")
+    temp_path.unlink(missing_ok=True)
     return None
 
-def process_rag_request_background(urls: list, pdf_urls: list):
-    """Runs the scraping and processing in a background thread and ingests to WebUI."""
-    logger.info(f"Background task started for {len(urls)} URLs and {len(pdf_urls)} PDFs.")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    # Process URLs asynchronously
-    scraping_tasks = [scrape_and_save_url(url) for url in urls]
-    if scraping_tasks:
-        # This will return a list of Paths or Nones
-        processed_files = loop.run_until_complete(asyncio.gather(*scraping_tasks))
-        for file_path in processed_files:
-            if file_path:
-                add_document_to_webui(file_path)
-
-    # Process PDFs sequentially
-    for pdf_url in pdf_urls:
-        file_path = download_and_process_pdf(pdf_url)
-        if file_path:
-            add_document_to_webui(file_path)
+async def ingest_document(file_path: Path) -> list:
+    """Splits a saved document into chunks and uploads them to WebUI, returning the ingested chunk names."""
+    # Tokenizing is CPU-bound; keep it off the loop so other scrapes and uploads progress
+    chunk_paths = await asyncio.to_thread(chunk_file, file_path)
+    if config.LOCAL_EMBEDDING:
+        # Batched with other documents' chunks on the embedding thread, beside the uploads
+        embedding = embedding_engine.submit(chunk_paths)
+    results = await asyncio.gather(*(add_document_to_webui(chunk_path) for chunk_path in chunk_paths))
+    if all(ok or webui_client.is_pending(chunk_path) for chunk_path, ok in zip(chunk_paths, results)):
+        # Delivered or left to the outbox; until then a re-scrape of the same content ingests it again
+        content_index.mark_ingested(file_path)
+    if config.LOCAL_EMBEDDING:
+        try:
+            await asyncio.wrap_future(embedding)
+        except Exception as e:
+            logger.error(f"Local embedding of {file_path.name} failed: {e}")
+    return [chunk_path.name for chunk_path, ok in zip(chunk_paths, results) if ok]
+
+async def scrape_and_ingest_url(url: str) -> list:
+    """Scrapes one URL and ingests it as soon as it is saved.
 
+    The page's validators are stored only after ingestion, so a job that dies
+    in between re-fetches the page in full when it is retried.
+    """
+    page = await WebScraper(await session_manager.get_session()).scrape_page(url)
+    if not page.has_content:
+        return []
+    file_path = await asyncio.to_thread(page.save)
+    names = await ingest_document(file_path) if file_path else []
+    page.commit()
+    return names
+
+async def download_and_ingest_pdf(pdf_url: str) -> list:
+    """Downloads and extracts one PDF and ingests it as soon as it is saved."""
+    file_path = await asyncio.to_thread(download_and_process_pdf, pdf_url)
+    return await ingest_document(file_path) if file_path else []
+
+async def process_rag_request_background(urls: list, pdf_urls: list) -> dict:
+    """Job handler that scrapes and processes URLs and PDFs and ingests them to WebUI.
+
+    Every document flows through its own scrape -> chunk -> upload pipeline, so
+    uploads of finished documents overlap with scrapes still in progress.
+    """
+    logger.info(f"Background task started for {len(urls)} URLs and {len(pdf_urls)} PDFs.")
+    tasks = [scrape_and_ingest_url(url) for url in urls] + [download_and_ingest_pdf(pdf_url) for pdf_url in pdf_urls]
+    ingested = [name for names in await asyncio.gather(*tasks) for name in names]
     logger.info("Background RAG update task finished.")
+    return {"files": ingested}
+
+async def process_pdf_upload_background(temp_path: str, original_filename: str) -> dict:
+    """Job handler that extracts an uploaded PDF on the PDF pool and ingests it to WebUI."""
+    try:
+        output_path = await asyncio.to_thread(process_pdf, Path(temp_path), original_filename)
+    except DuplicateDocument:
+        # Already ingested: a successful no-op rather than a failed job
+        return {"files": [], "duplicate": True}
+    if not output_path:
+        raise RuntimeError(f"Failed to process PDF file '{original_filename}'.")
+    return {"files": await ingest_document(output_path)}
+
+async def process_crawl_background(urls: list, max_depth: int, max_pages: int) -> dict:
+    """Job handler that crawls from seed URLs, ingesting each new or changed page as it is scraped."""
+    logger.info(f"Crawl started from {len(urls)} seed URLs (depth {max_depth}, up to {max_pages} pages).")
+
+    async def ingest_page(page: ScrapedPage) -> list:
+        file_path = await asyncio.to_thread(page.save)
+        return await ingest_document(file_path) if file_path else []
+
+    crawler = Crawler(WebScraper(await session_manager.get_session()), max_depth, max_pages)
+    summary = await crawler.crawl(urls, ingest_page)
+    return {
+        "pages": summary["pages"],
+        "discovered": summary["discovered"],
+        "files": [name for names in summary["results"].values() for name in names],
+    }
+
+async def process_feed_background(feed_urls: list) -> dict:
+    """Job handler that scrapes and ingests the new and changed pages listed by sitemaps or feeds."""
+    logger.info(f"Feed sync started for {len(feed_urls)} sitemaps/feeds.")
+
+    async def ingest_page(page: ScrapedPage) -> list:
+        file_path = await asyncio.to_thread(page.save)
+        return await ingest_document(file_path) if file_path else []
+
+    reader = FeedReader(WebScraper(await session_manager.get_session()))
+    ingested, counts = [], {"listed": 0, "changed": 0, "failed": 0}
+    for feed_url in feed_urls:
+        summary = await reader.sync(feed_url, ingest_page)
+        for key in counts:
+            counts[key] += summary[key]
+        ingested.extend(name for names in summary["results"].values() for name in names)
+    return {**counts, "files": ingested}
+
+job_queue.register("rag", process_rag_request_background)
+job_queue.register("pdf", process_pdf_upload_background)
+job_queue.register("crawl", process_crawl_background)
+job_queue.register("feed", process_feed_background)
+
+# Only the serving process consumes jobs: not the debug reloader's watcher process,
+# nor pool processes that re-import the main module when they are spawned.
+if multiprocessing.current_process().name == "MainProcess" and (__name__ != '__main__' or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+    job_queue.start()
+    # Redeliver documents left in the ingestion outbox by a previous run
+    webui_client.start_outbox_drainer()
+    # Pick up files added or removed while the API was not running
+    threading.Thread(target=file_index.reconcile, name="file-index-reconcile", daemon=True).start()
+    threading.Thread(target=bm25_index.reconcile, name="bm25-index-reconcile", daemon=True).start()
 
 @app.route('/api/rag-webhook', methods=['POST'])
 def rag_webhook_endpoint():
@@ -85,24 +193,46 @@ def rag_webhook_endpoint():
     if not urls and not pdf_urls:
         return jsonify({"error": "Payload must contain 'urls' and/or 'pdfs'"}), 400
 
-    thread = threading.Thread(target=process_rag_request_background, args=(urls, pdf_urls))
-    thread.start()
+    job_id = job_queue.enqueue("rag", {"urls": urls, "pdf_urls": pdf_urls})
 
     return jsonify({
         "status": "accepted",
+        "job_id": job_id,
         "message": f"Task accepted to process {len(urls)} URLs and {len(pdf_urls)} PDFs."
     }), 202
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Returns the status of a background job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job)
+
 @app.route('/api/files', methods=['GET'])
 def list_files():
-    """Lists all processed .txt files, sorted by modification time."""
+    """Lists processed .txt files, newest first, one page at a time.
+
+    Query parameters: limit, offset, q (substring of the name or source),
+    since/until (Unix seconds), details=true for size/mtime/source objects.
+    The total number of matching files is returned in X-Total-Count.
+    """
     try:
-        files = sorted(
-            config.OUTPUT_DIR.glob('*.txt'),
-            key=os.path.getmtime,
-            reverse=True
+        limit = min(request.args.get('limit', config.FILES_PAGE_SIZE, type=int), config.FILES_MAX_PAGE_SIZE)
+        offset = request.args.get('offset', 0, type=int)
+        if limit < 1 or offset < 0:
+            return jsonify({"error": "limit must be positive and offset non-negative"}), 400
+        files, total = file_index.list(
+            limit,
+            offset,
+            query=request.args.get('q') or None,
+            since=request.args.get('since', type=float),
+            until=request.args.get('until', type=float),
         )
-        return jsonify([f.name for f in files])
+        details = request.args.get('details', '').lower() in ('1', 'true', 'yes')
+        response = jsonify(files if details else [f["name"] for f in files])
+        response.headers['X-Total-Count'] = str(total)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -133,15 +263,69 @@ def scrape_url_endpoint():
     if not urls:
         return jsonify({"error": "Payload must contain 'urls'"}), 400
 
-    # Use the existing background processing function, passing an empty list for pdf_urls
-    thread = threading.Thread(target=process_rag_request_background, args=(urls, []))
-    thread.start()
+    # Use the existing background processing job, passing an empty list for pdf_urls
+    job_id = job_queue.enqueue("rag", {"urls": urls, "pdf_urls": []})
 
     return jsonify({
         "status": "accepted",
+        "job_id": job_id,
         "message": f"Task accepted to process {len(urls)} URLs."
     }), 202
 
+@app.route('/api/crawl', methods=['POST'])
+def crawl_endpoint():
+    """API endpoint to crawl sites from seed URLs, following links on the seeds' hosts.
+
+    Body: {"urls": [...], "max_depth": 3, "max_pages": 500}.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    urls = data.get('urls', [])
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        return jsonify({"error": "'urls' must be a list of URLs"}), 400
+    if not urls:
+        return jsonify({"error": "Payload must contain 'urls'"}), 400
+    max_depth = data.get('max_depth', config.CRAWL_MAX_DEPTH)
+    if not isinstance(max_depth, int) or max_depth < 0:
+        return jsonify({"error": "'max_depth' must be a non-negative integer"}), 400
+    max_pages = data.get('max_pages', config.CRAWL_MAX_PAGES)
+    if not isinstance(max_pages, int) or not 1 <= max_pages <= config.CRAWL_PAGE_LIMIT:
+        return jsonify({"error": f"'max_pages' must be an integer between 1 and {config.CRAWL_PAGE_LIMIT}"}), 400
+
+    job_id = job_queue.enqueue("crawl", {"urls": urls, "max_depth": max_depth, "max_pages": max_pages})
+
+    return jsonify({
+        "status": "accepted",
+        "job_id": job_id,
+        "message": f"Crawl accepted from {len(urls)} URLs (depth {max_depth}, up to {max_pages} pages)."
+    }), 202
+
+@app.route('/api/feeds', methods=['POST'])
+def feeds_endpoint():
+    """API endpoint to ingest what changed in sitemaps or RSS/Atom feeds since their last sync.
+
+    Body: {"urls": [...]}, each a sitemap, (gzipped) sitemap index, RSS or Atom feed.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    urls = data.get('urls', [])
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        return jsonify({"error": "'urls' must be a list of URLs"}), 400
+    if not urls:
+        return jsonify({"error": "Payload must contain 'urls'"}), 400
+
+    job_id = job_queue.enqueue("feed", {"feed_urls": urls})
+
+    return jsonify({
+        "status": "accepted",
+        "job_id": job_id,
+        "message": f"Task accepted to sync {len(urls)} sitemaps/feeds."
+    }), 202
+
 @app.route('/api/upload', methods=['POST'])
 def upload_pdf_endpoint():
     """API endpoint to handle direct PDF file uploads."""
@@ -155,42 +339,69 @@ def upload_pdf_endpoint():
         temp_path = config.OUTPUT_DIR / f"temp_{uuid.uuid4()}.pdf"
         try:
             file.save(temp_path)
-            output_path = process_pdf(temp_path, original_filename)
-            if output_path:
-                # Run ingestion in a background thread
-                thread = threading.Thread(target=add_document_to_webui, args=(output_path,))
-                thread.start()
-                return jsonify({"message": f"Successfully processed '{original_filename}' and started ingestion."}), 200
-            else:
-                return jsonify({"error": "Failed to process PDF file."}), 500
+            # Extraction and ingestion run as a background job on the PDF pool
+            job_id = job_queue.enqueue("pdf", {"temp_path": str(temp_path), "original_filename": original_filename})
+            return jsonify({
+                "status": "accepted",
+                "job_id": job_id,
+                "message": f"Accepted '{original_filename}' for processing and ingestion."
+            }), 202
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     return jsonify({"error": "Invalid file type. Please upload a PDF."}), 400
 
+@app.route('/api/search', methods=['POST'])
+def search_endpoint():
+    """Search processed documents by keywords and meaning.
+
+    Body: {"query": "...", "top_k": 10, "mode": "hybrid"|"vector"|"keyword",
+    "approximate": true|false}. Hybrid mode fuses BM25 and embedding results by
+    reciprocal rank; `approximate` forces the IVF vector index on or off.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+    query = data.get('query')
+    if not isinstance(query, str) or not query.strip():
+        return jsonify({"error": "Payload must contain a non-empty 'query'"}), 400
+    top_k = data.get('top_k', config.SEARCH_TOP_K)
+    if not isinstance(top_k, int) or not 1 <= top_k <= config.SEARCH_MAX_TOP_K:
+        return jsonify({"error": f"'top_k' must be an integer between 1 and {config.SEARCH_MAX_TOP_K}"}), 400
+    mode = data.get('mode', 'hybrid')
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": f"'mode' must be one of {', '.join(SEARCH_MODES)}"}), 400
+
+    started = time.perf_counter()
+    try:
+        results = hybrid_search(query, top_k, mode, approximate=data.get('approximate'))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({
+        "query": query,
+        "mode": mode,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get file statistics"""
     import datetime
-    files = list(config.OUTPUT_DIR.glob("*.txt"))
-    total_size = sum(f.stat().st_size for f in files)
-    
-    # Find the most recently modified file
-    latest_file = None
-    latest_time = None
-    if files:
-        latest_file = max(files, key=lambda f: f.stat().st_mtime)
-        latest_time = datetime.datetime.fromtimestamp(latest_file.stat().st_mtime)
+    stats = file_index.stats()
+    total_size = stats["total_size"]
     
     result = {
-        "file_count": len(files),
+        "file_count": stats["file_count"],
         "total_size_bytes": total_size,
         "total_size_mb": round(total_size / (1024*1024), 1),
-        "total_size_human": f"{total_size / (1024*1024):.1f} MB" if total_size > 1024*1024 else f"{total_size / 1024:.1f} KB"
+        "total_size_human": format_size(total_size)
     }
     
-    if latest_file and latest_time:
+    if stats["latest"]:
+        latest_name, latest_mtime = stats["latest"]
+        latest_time = datetime.datetime.fromtimestamp(latest_mtime)
         result["last_updated"] = latest_time.strftime("%Y-%m-%d %H:%M:%S")
-        result["last_updated_file"] = latest_file.name
+        result["last_updated_file"] = latest_name
         result["last_updated_relative"] = get_relative_time(latest_time)
     else:
         result["last_updated"] = "No files found"
@@ -199,6 +410,9 @@ def get_stats():
     
     return jsonify(result)
 
+def format_size(total_size: int) -> str:
+    return f"{total_size / (1024*1024):.1f} MB" if total_size > 1024*1024 else f"{total_size / 1024:.1f} KB"
+
 def get_relative_time(timestamp):
     """Get human-readable relative time"""
     import datetime
@@ -219,6 +433,7 @@ def get_relative_time(timestamp):
 @app.route('/', methods=['GET'])
 def index():
     """Main page for RAG Scraper API"""
+    stats = file_index.stats()
     return """
     <!DOCTYPE html>
     <html>
@@ -285,8 +500,8 @@ def index():
             <div class="status" id="statusBar">
                 <strong>✅ API Status:</strong> Online and Ready<br>
                 <strong>🔄 Processing:</strong> Real-time (every 1 minute)<br>
-                <strong>📊 Files Available:</strong> """ + str(len(list(config.OUTPUT_DIR.glob("*.txt")))) + """ documents<br>
-                <strong>💾 Total Space:</strong> """ + f"{sum(f.stat().st_size for f in config.OUTPUT_DIR.glob('*.txt')) / (1024*1024):.1f} MB" + """<br>
+                <strong>📊 Files Available:</strong> """ + str(stats["file_count"]) + """ documents<br>
+                <strong>💾 Total Space:</strong> """ + f"{stats['total_size'] / (1024*1024):.1f} MB" + """<br>
                 <strong>🕒 Last Updated:</strong> <span id="lastUpdated">Loading...</span>
             </div>
             
@@ -294,8 +509,8 @@ def index():
             
             <div class="endpoint clickable" onclick="fetchFiles()">
                 <span class="method get">GET</span> <strong>/api/files</strong><br>
-                <em>List all processed files</em><br>
-                <small>💡 Click to fetch and display all files</small>
+                <em>List processed files, newest first (?limit, ?offset, ?q, ?since, ?until, ?details)</em><br>
+                <small>💡 Click to fetch and display the latest files</small>
             </div>
             
             <div class="endpoint clickable" onclick="fetchStats()">
@@ -310,12 +525,35 @@ def index():
                 <small>Body: {"urls": ["https://example.com"]}</small>
             </div>
             
+            <div class="endpoint">
+                <span class="method post">POST</span> <strong>/api/crawl</strong><br>
+                <em>Crawl sites from seed URLs and ingest every page found</em><br>
+                <small>Body: {"urls": [...], "max_depth": 3, "max_pages": 500}</small>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method post">POST</span> <strong>/api/feeds</strong><br>
+                <em>Ingest new and changed pages from sitemaps or RSS/Atom feeds</em><br>
+                <small>Body: {"urls": ["https://example.com/sitemap.xml"]}</small>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method post">POST</span> <strong>/api/search</strong><br>
+                <em>Search documents by keywords (BM25) and meaning, fused by rank</em><br>
+                <small>Body: {"query": "...", "top_k": 10, "mode": "hybrid"}</small>
+            </div>
+            
             <div class="endpoint">
                 <span class="method post">POST</span> <strong>/api/rag-webhook</strong><br>
                 <em>n8n integration webhook</em><br>
                 <small>Body: {"urls": [...], "pdfs": [...]}</small>
             </div>
             
+            <div class="endpoint">
+                <span class="method get">GET</span> <strong>/api/jobs/&lt;job_id&gt;</strong><br>
+                <em>Check the status of a background job</em>
+            </div>
+            
             <div class="endpoint">
                 <span class="method post">POST</span> <strong>/api/upload</strong><br>
                 <em>Upload PDF files for processing</em>
@@ -348,7 +586,7 @@ def index():
                     }
                     
                     const files = await response.json();
-                    displayFiles(files);
+                    displayFiles(files, Number(response.headers.get('X-Total-Count') || files.length));
                     updateStats(); // Update stats after fetching files
                 } catch (error) {
                     resultsDiv.innerHTML = `
@@ -428,7 +666,7 @@ def index():
                 }
             }
             
-            function displayFiles(files) {
+            function displayFiles(files, total) {
                 const resultsDiv = document.getElementById('results');
                 
                 if (!files || files.length === 0) {
@@ -449,8 +687,8 @@ def index():
                 
                 resultsDiv.innerHTML = `
                     <div class="result">
-                        <h4>📁 Files (${files.length})</h4>
-                        <div class="success">✅ Found ${files.length} processed files. Click any file to download.</div>
+                        <h4>📁 Files (${total})</h4>
+                        <div class="success">✅ Showing the ${files.length} most recent of ${total} processed files. Click any file to download.</div>
                         <div class="file-list">
                             ${fileList}
                         </div>
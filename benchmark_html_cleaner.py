@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark the HTML cleaning backends on a corpus of saved pages
+"""
+import argparse
+import time
+from pathlib import Path
+from loguru import logger
+from html_cleaner import BS4Cleaner, LxmlCleaner
+
+def load_corpus(directory: Path, limit: int | None = None) -> list[tuple[Path, str]]:
+    """Load saved .html/.htm pages from a directory tree"""
+    paths = sorted(p for p in directory.rglob("*") if p.suffix.lower() in (".html", ".htm"))
+    if limit:
+        paths = paths[:limit]
+    return [(p, p.read_text(encoding="utf-8", errors="replace")) for p in paths]
+
+def time_cleaner(cleaner, pages: list[tuple[Path, str]], rounds: int) -> tuple[float, list[str]]:
+    """Return the best wall time over `rounds` runs and the output of the last run"""
+    best = float("inf")
+    outputs = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        outputs = [cleaner.clean(html) for _, html in pages]
+        best = min(best, time.perf_counter() - started)
+    return best, outputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML cleaning backends")
+    parser.add_argument("corpus", type=Path, help="Directory of saved HTML pages (searched recursively)")
+    parser.add_argument("--limit", type=int, help="Only use the first N pages")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed runs per backend; the best is reported (default: 3)")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.limit)
+    if not pages:
+        logger.error(f"No .html pages found under {args.corpus}")
+        return
+    total_mb = sum(len(html.encode("utf-8")) for _, html in pages) / (1024 * 1024)
+    logger.info(f"Loaded {len(pages)} pages ({total_mb:.1f} MB) from {args.corpus}")
+
+    baseline_time, baseline = time_cleaner(BS4Cleaner(), pages, args.rounds)
+    fast_time, fast = time_cleaner(LxmlCleaner(), pages, args.rounds)
+    main_time, main_content = time_cleaner(LxmlCleaner(main_content=True), pages, args.rounds)
+
+    mismatches = [path for (path, _), a, b in zip(pages, baseline, fast) if a != b]
+
+    print(f"\n{'backend':<10} {'seconds':>9} {'pages/s':>9} {'MB/s':>7} {'output KB':>10}")
+    runs = (("bs4", baseline_time, baseline), ("lxml", fast_time, fast), ("lxml+main", main_time, main_content))
+    for name, elapsed, outputs in runs:
+        output_kb = sum(len(text.encode("utf-8")) for text in outputs) / 1024
+        print(f"{name:<10} {elapsed:>9.3f} {len(pages) / elapsed:>9.1f} {total_mb / elapsed:>7.2f} {output_kb:>10.1f}")
+    print(f"\nSpeedup: {baseline_time / fast_time:.1f}x")
+    full_size = sum(len(text) for text in fast)
+    print(f"Main-content output: {sum(len(text) for text in main_content) / max(full_size, 1):.0%} of full-page text")
+    print(f"Identical bs4/lxml output: {len(pages) - len(mismatches)}/{len(pages)} pages")
+    for path in mismatches[:10]:
+        print(f"  differs: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark building and querying the BM25 index on a corpus of processed documents
+"""
+import argparse
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from loguru import logger
+from config import config
+from bm25_index import BM25Index
+from hybrid_search import reciprocal_rank_fusion
+
+def sample_queries(texts: list[str], count: int, seed: int = 0) -> list[str]:
+    """Queries of one to three words taken from the corpus, about a third of them identifier-like"""
+    rng = random.Random(seed)
+    words = [re.findall(r"\S+", text) for text in texts]
+    words = [w for w in words if w]
+    identifiers = [word for doc in words for word in doc if re.search(r"\d", word) and re.search(r"[-_.]", word)]
+    queries = []
+    for i in range(count):
+        if identifiers and i % 3 == 0:
+            queries.append(rng.choice(identifiers))
+        else:
+            doc = rng.choice(words)
+            start = rng.randrange(len(doc))
+            queries.append(" ".join(doc[start:start + rng.randint(1, 3)]))
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BM25 index and rank fusion")
+    parser.add_argument("corpus", type=Path, nargs="?", default=config.OUTPUT_DIR, help="Directory of .txt documents (default: the output directory)")
+    parser.add_argument("--limit", type=int, help="Only index the first N documents")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of timed queries (default: 1000)")
+    parser.add_argument("--top-k", type=int, default=config.SEARCH_CANDIDATES, help="Results per query")
+    args = parser.parse_args()
+
+    paths = sorted(args.corpus.glob("*.txt"))[:args.limit]
+    if not paths:
+        logger.error(f"No .txt documents found in {args.corpus}")
+        return
+    texts = [p.read_text(encoding="utf-8", errors="ignore") for p in paths]
+    total_mb = sum(len(text.encode("utf-8")) for text in texts) / (1024 * 1024)
+    logger.info(f"Loaded {len(paths)} documents ({total_mb:.1f} MB) from {args.corpus}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BM25Index(Path(tmp) / "bm25.db", directory=args.corpus)
+        started = time.perf_counter()
+        index.add_many(zip(paths, texts))
+        index.merge()
+        build = time.perf_counter() - started
+        size_mb = sum(f.stat().st_size for f in Path(tmp).iterdir()) / (1024 * 1024)
+
+        # Incremental updates: re-index single documents, one transaction each, as writers do
+        updates = random.Random(1).sample(range(len(paths)), min(100, len(paths)))
+        started = time.perf_counter()
+        for i in updates:
+            index.add(paths[i], texts[i])
+        update_ms = (time.perf_counter() - started) / len(updates) * 1000
+
+        queries = sample_queries(texts, args.queries)
+        latencies, rankings = [], []
+        for query in queries:
+            started = time.perf_counter()
+            hits = index.search(query, args.top_k)
+            latencies.append(time.perf_counter() - started)
+            rankings.append([hit["name"] for hit in hits])
+
+    # Fusion cost on its own: each keyword ranking fused with a shuffled copy standing in for vector results
+    rng = random.Random(2)
+    started = time.perf_counter()
+    for names in rankings:
+        reciprocal_rank_fusion({"keyword": names, "vector": rng.sample(names, len(names))})
+    fusion_us = (time.perf_counter() - started) / len(rankings) * 1e6
+
+    latencies = np.array(latencies) * 1000
+    print(f"\nBuild:   {build:.2f}s for {len(paths)} documents ({len(paths) / build:.0f} docs/s, {total_mb / build:.2f} MB/s), index {size_mb:.1f} MB")
+    print(f"Update:  {update_ms:.2f} ms per re-indexed document")
+    print(f"Query:   {len(queries) / (latencies.sum() / 1000):.0f} queries/s, "
+          f"p50 {np.percentile(latencies, 50):.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms")
+    print(f"Fusion:  {fusion_us:.1f} us per query (top {args.top_k} from each retriever)")
+    print(f"Matched: {sum(1 for names in rankings if names) / len(rankings):.0%} of queries returned results")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from config import config
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    live INTEGER NOT NULL DEFAULT 1,
+    generation INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_live_name ON docs (name) WHERE live = 1;
+CREATE INDEX IF NOT EXISTS idx_docs_generation ON docs (generation);
+CREATE TABLE IF NOT EXISTS segments (
+    seg INTEGER PRIMARY KEY,
+    level INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    seg INTEGER NOT NULL,
+    docs BLOB NOT NULL,
+    tfs BLOB NOT NULL,
+    PRIMARY KEY (seg, term)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (term);
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    generation INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (id, generation) VALUES (0, 0);
+"""
+
+WORD_RE = re.compile(r"\w+")
+# Identifiers such as CVE-2024-1234, gpt-4o or v1.2.3, indexed whole as well as by their parts
+COMPOUND_RE = re.compile(r"\b\w+(?:[-.:/]\w+)+")
+
+# Files indexed per transaction when adding many at once
+_WRITE_BATCH = 200
+
+def tokenize(text: str) -> Tuple[List[str], int]:
+    """Index terms of a text and its length in words."""
+    text = text.lower()
+    words = WORD_RE.findall(text)
+    return words + COMPOUND_RE.findall(text), len(words)
+
+@dataclass
+class _Stats:
+    """Per-document lengths and liveness as of one generation, indexed by document ID."""
+    generation: int
+    lengths: np.ndarray
+    live: np.ndarray
+    doc_count: int
+    avg_length: float
+
+class BM25Index(SQLiteStore):
+    """On-disk inverted index with BM25 ranking over the documents in OUTPUT_DIR.
+
+    Postings are stored per term as packed int32 arrays of document IDs and
+    term frequencies, so a query reads one blob per term and segment and scores
+    every matching document in a few numpy operations. Like an LSM tree, each
+    write adds a small segment and replaced or deleted documents are only
+    tombstoned; segments are merged in tiers of `merge_factor` on a background
+    thread, which also drops the postings of dead documents.
+    """
+
+    def __init__(self, db_path: Path, directory: Path = config.OUTPUT_DIR, k1: float = config.BM25_K1,
+                 b: float = config.BM25_B, merge_factor: int = config.BM25_MERGE_FACTOR):
+        self.db_path = Path(db_path)
+        self.directory = Path(directory)
+        self.k1 = k1
+        self.b = b
+        self.merge_factor = merge_factor
+        self._create(SCHEMA)
+        self._stats = _Stats(0, np.zeros(0, dtype=np.float32), np.zeros(0, dtype=bool), 0, 0.0)
+        self._stats_lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._merger: Optional[threading.Thread] = None
+
+    def _indexed(self, path: Path) -> bool:
+        """Only top-level .txt documents are indexed (not chunks or temp files)."""
+        return path.suffix == ".txt" and path.parent.resolve() == self.directory.resolve()
+
+    @staticmethod
+    def _next_generation(conn) -> int:
+        return conn.execute("UPDATE meta SET generation = generation + 1 WHERE id = 0 RETURNING generation").fetchone()[0]
+
+    def add(self, path: Path, text: Optional[str] = None):
+        """Index or re-index a file after it has been written; `text` saves re-reading it."""
+        self.add_many([(Path(path), text)])
+
+    def add_many(self, files: Iterable[Tuple[Path, Optional[str]]]) -> int:
+        """Index (path, text or None) pairs, one segment per batch of files; returns how many were indexed."""
+        count = 0
+        files = iter(files)
+        while True:
+            batch = []
+            for path, text in files:
+                path = Path(path)
+                if not self._indexed(path):
+                    continue
+                try:
+                    stat = path.stat()
+                    if text is None:
+                        text = path.read_text(encoding="utf-8", errors="ignore")
+                except FileNotFoundError:
+                    continue
+                terms, length = tokenize(text)
+                batch.append((path.name, stat.st_size, stat.st_mtime, length, Counter(terms)))
+                if len(batch) >= _WRITE_BATCH:
+                    break
+            if not batch:
+                break
+            self._write_segment(batch)
+            count += len(batch)
+        if count:
+            self._schedule_merge()
+        return count
+
+    @staticmethod
+    def _group_postings(counters: List[Counter]) -> List[tuple]:
+        """Group a batch's term counts by term: (term, batch positions of its documents, frequencies), by term."""
+        vocab, codes, tfs = {}, [], []
+        for counts in counters:
+            codes.extend(vocab.setdefault(term, len(vocab)) for term in counts)
+            tfs.extend(counts.values())
+        codes = np.array(codes, dtype=np.int64)
+        order = np.argsort(codes, kind="stable")
+        docs = np.repeat(np.arange(len(counters), dtype=np.int32), [len(counts) for counts in counters])[order]
+        tfs = np.array(tfs, dtype=np.int32)[order]
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(vocab)))])
+        return sorted((term, docs[bounds[code]:bounds[code + 1]], tfs[bounds[code]:bounds[code + 1]])
+                      for term, code in vocab.items())
+
+    def _write_segment(self, batch: list):
+        # Grouped before taking the write lock; positions become IDs once the documents are inserted
+        postings = self._group_postings([counts for *_, counts in batch])
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            generation = self._next_generation(conn)
+            names = [name for name, *_ in batch]
+            conn.execute(
+                f"UPDATE docs SET live = 0, generation = ? WHERE live = 1 AND name IN ({','.join('?' * len(names))})",
+                [generation, *names],
+            )
+            doc_ids = np.array([
+                conn.execute(
+                    "INSERT INTO docs (name, length, size, mtime, generation) VALUES (?, ?, ?, ?, ?)",
+                    (name, length, size, mtime, generation),
+                ).lastrowid
+                for name, size, mtime, length, _ in batch
+            ], dtype=np.int32)
+            seg = conn.execute("INSERT INTO segments (level) VALUES (0)").lastrowid
+            conn.executemany(
+                "INSERT INTO postings (term, seg, docs, tfs) VALUES (?, ?, ?, ?)",
+                [(term, seg, doc_ids[positions].tobytes(), tfs.tobytes()) for term, positions, tfs in postings],
+            )
+            conn.execute("COMMIT")
+
+    def remove(self, path: Path):
+        """Drop a file after it has been deleted."""
+        path = Path(path)
+        if not self._indexed(path):
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            generation = self._next_generation(conn)
+            conn.execute("UPDATE docs SET live = 0, generation = ? WHERE live = 1 AND name = ?", (generation, path.name))
+            conn.execute("COMMIT")
+
+    def _load_stats(self, conn) -> _Stats:
+        """Document statistics, reading only the documents added or tombstoned since the cached generation."""
+        generation = conn.execute("SELECT generation FROM meta WHERE id = 0").fetchone()[0]
+        with self._stats_lock:
+            stats = self._stats
+            if stats.generation == generation:
+                return stats
+            changed = conn.execute(
+                "SELECT id, length, live FROM docs WHERE generation > ? AND generation <= ?", (stats.generation, generation)
+            ).fetchall()
+            lengths, live = stats.lengths, stats.live
+            if changed:
+                ids = np.array([row[0] for row in changed], dtype=np.int64)
+                size = max(len(lengths), int(ids.max()) + 1)
+                lengths = np.concatenate([lengths, np.zeros(size - len(lengths), dtype=np.float32)])
+                live = np.concatenate([live, np.zeros(size - len(live), dtype=bool)])
+                lengths[ids] = [row[1] for row in changed]
+                live[ids] = [bool(row[2]) for row in changed]
+            doc_count = int(live.sum())
+            avg_length = float(lengths[live].mean()) if doc_count else 0.0
+            self._stats = _Stats(generation, lengths, live, doc_count, avg_length)
+            return self._stats
+
+    def search(self, query: str, limit: int = config.SEARCH_TOP_K) -> List[dict]:
+        """Return up to `limit` documents matching any term of `query`, best BM25 score first."""
+        terms = list(dict.fromkeys(tokenize(query)[0]))
+        if not terms:
+            return []
+        with self._connect() as conn:
+            # One read transaction, so postings never reference documents newer than the statistics
+            conn.execute("BEGIN")
+            stats = self._load_stats(conn)
+            if not stats.doc_count:
+                conn.execute("COMMIT")
+                return []
+            scores = np.zeros(len(stats.lengths), dtype=np.float32)
+            for term in terms:
+                rows = conn.execute("SELECT docs, tfs FROM postings WHERE term = ?", (term,)).fetchall()
+                if not rows:
+                    continue
+                ids = np.concatenate([np.frombuffer(docs, dtype=np.int32) for docs, _ in rows])
+                tfs = np.concatenate([np.frombuffer(tfs, dtype=np.int32) for _, tfs in rows])
+                alive = stats.live[ids]
+                ids, tfs = ids[alive], tfs[alive].astype(np.float32)
+                if not len(ids):
+                    continue
+                # Lucene's non-negative IDF, so terms in most documents still count a little
+                idf = math.log(1 + (stats.doc_count - len(ids) + 0.5) / (len(ids) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * stats.lengths[ids] / stats.avg_length)
+                scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+            conn.execute("COMMIT")
+            matched = np.flatnonzero(scores)
+            if len(matched) > limit:
+                matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            names = dict(conn.execute(
+                f"SELECT id, name FROM docs WHERE id IN ({','.join('?' * len(matched))})", matched.tolist()
+            )) if len(matched) else {}
+        return [{"name": names[doc_id], "score": round(float(scores[doc_id]), 6)} for doc_id in matched.tolist()]
+
+    def snippet(self, name: str, query: str, width: int = config.SEARCH_SNIPPET_CHARS) -> Optional[str]:
+        """Text around the first occurrence of a query term in a document, or its start."""
+        try:
+            text = (self.directory / name).read_text(encoding="utf-8", errors="ignore")
+        except FileNotFoundError:
+            return None
+        terms = [re.escape(term) for term in dict.fromkeys(tokenize(query)[0])]
+        match = re.search(rf"\b(?:{'|'.join(terms)})\b", text, re.IGNORECASE) if terms else None
+        start = max(match.start() - width // 3, 0) if match else 0
+        return " ".join(text[start:start + width].split())
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM docs WHERE live = 1").fetchone()[0]
+
+    def _schedule_merge(self):
+        """Merge segments on a background thread so writers never wait for a large merge."""
+        with self._merge_lock:
+            if self._merger is None or not self._merger.is_alive():
+                self._merger = threading.Thread(target=self.merge, name="bm25-merge", daemon=True)
+                self._merger.start()
+
+    def merge(self, full: bool = False):
+        """Merge every tier holding `merge_factor` segments into one segment of the next tier.
+
+        With `full`, all segments are merged into one, like an index optimize.
+        Merged postings are computed from a read snapshot, so the write lock is
+        only held to swap the segments and writers are not stalled by a large merge.
+        """
+        while True:
+            started = time.monotonic()
+            with self._connect() as conn:
+                conn.execute("BEGIN")
+                segs, level = self._merge_candidates(conn, full)
+                if not segs:
+                    conn.execute("COMMIT")
+                    return
+                postings = self._merged_postings(conn, segs)
+                conn.execute("COMMIT")
+
+                placeholders = ",".join("?" * len(segs))
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute(f"SELECT COUNT(*) FROM segments WHERE seg IN ({placeholders})", segs).fetchone()[0] != len(segs):
+                    # Another process merged some of these segments first
+                    conn.execute("ROLLBACK")
+                    continue
+                merged = conn.execute("INSERT INTO segments (level) VALUES (?)", (level,)).lastrowid
+                conn.execute(f"DELETE FROM postings WHERE seg IN ({placeholders})", segs)
+                conn.execute(f"DELETE FROM segments WHERE seg IN ({placeholders})", segs)
+                conn.executemany(
+                    "INSERT INTO postings (term, seg, docs, tfs) VALUES (?, ?, ?, ?)",
+                    [(term, merged, ids, tfs) for term, ids, tfs in postings],
+                )
+                conn.execute("COMMIT")
+            logger.debug(f"Merged {len(segs)} BM25 segments into tier {level} ({len(postings)} terms) in {time.monotonic() - started:.2f}s")
+            if full:
+                return
+
+    def _merge_candidates(self, conn, full: bool) -> Tuple[List[int], int]:
+        """Segments to merge next and the tier of the merged segment, or no segments."""
+        if full:
+            segments = conn.execute("SELECT seg, level FROM segments").fetchall()
+            if len(segments) <= 1:
+                return [], 0
+            return [seg for seg, _ in segments], max(level for _, level in segments) + 1
+        row = conn.execute(
+            "SELECT level FROM segments GROUP BY level HAVING COUNT(*) >= ? ORDER BY level LIMIT 1", (self.merge_factor,)
+        ).fetchone()
+        if row is None:
+            return [], 0
+        return [seg for (seg,) in conn.execute("SELECT seg FROM segments WHERE level = ?", row)], row[0] + 1
+
+    @staticmethod
+    def _merged_postings(conn, segs: List[int]) -> List[tuple]:
+        """Concatenated postings of the segments per term, without tombstoned documents."""
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM docs").fetchone()[0]
+        dead = np.zeros(max_id + 1, dtype=bool)
+        dead[[doc_id for (doc_id,) in conn.execute("SELECT id FROM docs WHERE live = 0")]] = True
+        rows = conn.execute(
+            f"SELECT term, docs, tfs FROM postings WHERE seg IN ({','.join('?' * len(segs))}) ORDER BY term", segs
+        )
+        postings = []
+        for term, group in groupby(rows, key=lambda row: row[0]):
+            group = list(group)
+            ids = np.concatenate([np.frombuffer(row[1], dtype=np.int32) for row in group])
+            tfs = np.concatenate([np.frombuffer(row[2], dtype=np.int32) for row in group])
+            keep = ~dead[ids]
+            if keep.any():
+                postings.append((term, ids[keep].tobytes(), tfs[keep].tobytes()))
+        return postings
+
+    def reconcile(self) -> Tuple[int, int]:
+        """Bring the index in line with the directory; returns (added or updated, removed)."""
+        started = time.monotonic()
+        on_disk = {}
+        for path in self.directory.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            on_disk[path.name] = (stat.st_size, stat.st_mtime)
+        with self._connect() as conn:
+            indexed = {name: (size, mtime) for name, size, mtime in conn.execute("SELECT name, size, mtime FROM docs WHERE live = 1")}
+            removed = []
+            missing = indexed.keys() - on_disk.keys()
+            if missing:
+                conn.execute("BEGIN IMMEDIATE")
+                # Re-checked under the write lock: a document saved since the scan is indexed, not gone
+                removed = [name for name in missing if not (self.directory / name).exists()]
+                if removed:
+                    generation = self._next_generation(conn)
+                    conn.executemany(
+                        "UPDATE docs SET live = 0, generation = ? WHERE live = 1 AND name = ?",
+                        [(generation, name) for name in removed],
+                    )
+                conn.execute("COMMIT")
+        changed = self.add_many(
+            (self.directory / name, None) for name, meta in on_disk.items() if indexed.get(name) != meta
+        )
+        logger.info(f"Reconciled BM25 index in {time.monotonic() - started:.1f}s: {changed} added or updated, {len(removed)} removed")
+        return changed, len(removed)
+
+# Global BM25 index instance
+bm25_index = BM25Index(config.BM25_INDEX_PATH)
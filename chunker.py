@@ -0,0 +1,142 @@
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+import tiktoken
+from loguru import logger
+from config import config
+
+# Markdown headings, numbered section titles ("2.1 Results") and short all-caps lines
+HEADING_RE = re.compile(r"^(#{1,6}\s+\S|\d+(\.\d+)*\.?\s+[A-Z]|[A-Z][A-Z0-9 ,\-:&]{2,80}$)")
+# Chunk files written by chunk_files: <document stem>_partNNN.txt
+CHUNK_NAME_RE = re.compile(r"^(?P<stem>.+)_part\d{3,}\.txt$")
+
+@lru_cache(maxsize=None)
+def get_encoder(encoding_name: str = config.TOKEN_ENCODING) -> tiktoken.Encoding:
+    """Return the tokenizer for `encoding_name`, loading it only once per process."""
+    return tiktoken.get_encoding(encoding_name)
+
+def split_blocks(text: str) -> List[str]:
+    """Split text into paragraph blocks.
+
+    Paragraphs are separated by blank lines. Scraped HTML has one text node per
+    line and no blank lines, so in that case every line is its own block.
+    """
+    text = text.replace("\r\n", "\n")
+    if "\n\n" in text:
+        blocks = re.split(r"\n\s*\n", text)
+    else:
+        blocks = text.split("\n")
+    return [block.strip() for block in blocks if block.strip()]
+
+class TextChunker:
+    """Splits documents into token-bounded, overlapping chunks along paragraph and heading boundaries."""
+
+    def __init__(self, max_tokens: int = config.MAX_CHUNK_SIZE, overlap: int = config.CHUNK_OVERLAP,
+                 encoding_name: str = config.TOKEN_ENCODING):
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.encoder = get_encoder(encoding_name)
+        self.separator = self.encoder.encode_ordinary("\n\n")
+        if overlap + len(self.separator) >= max_tokens:
+            raise ValueError("Chunk overlap must be smaller than the maximum chunk size")
+
+    def _pack(self, blocks: List[str], block_tokens: List[List[int]]) -> List[str]:
+        """Greedily pack encoded blocks into chunks of at most max_tokens."""
+        chunks: List[List[int]] = []
+        current: List[int] = []
+        fresh = 0  # Tokens in `current` that are not overlap carried from the previous chunk
+
+        def flush():
+            nonlocal current, fresh
+            if fresh:
+                chunks.append(current)
+                current = current[-self.overlap:] if self.overlap else []
+            fresh = 0
+
+        for block, tokens in zip(blocks, block_tokens):
+            # Start a new chunk at a heading once the current one is reasonably full
+            if HEADING_RE.match(block) and fresh and len(current) >= self.max_tokens // 2:
+                flush()
+
+            # Move a block that overflows the current chunk into the next one, unless it would
+            # not fit a fresh chunk either; such blocks fill the current chunk and continue in the next
+            fits_fresh = self.overlap + len(self.separator) + len(tokens) <= self.max_tokens
+            if fits_fresh and len(current) + len(self.separator) + len(tokens) > self.max_tokens:
+                flush()
+
+            # Append the block, cutting it into overlapping windows if it is too large
+            start = 0
+            split = False  # Whether `current` ends with the overlap of this block's previous window
+            while start < len(tokens):
+                # A window continues its own overlap directly; only whole blocks are separated
+                separator = self.separator if current and not split else []
+                room = self.max_tokens - len(current) - len(separator)
+                if room <= 0:
+                    # Not even one token fits; the overlap left after flushing always leaves room
+                    flush()
+                    continue
+                piece = tokens[start:start + room]
+                current = current + separator + piece
+                fresh += len(piece)
+                start += len(piece)
+                if start < len(tokens):
+                    flush()
+                    split = True
+
+        if fresh:
+            chunks.append(current)
+        return [self.encoder.decode(chunk) for chunk in chunks]
+
+    def chunk(self, text: str) -> List[str]:
+        """Split one document into chunks."""
+        return self.chunk_many([text])[0]
+
+    def chunk_many(self, texts: List[str]) -> List[List[str]]:
+        """Split many documents, encoding all of their blocks in one batched call."""
+        doc_blocks = [split_blocks(text) for text in texts]
+        flat = [block for blocks in doc_blocks for block in blocks]
+        flat_tokens = self.encoder.encode_ordinary_batch(flat, num_threads=config.TOKENIZER_THREADS)
+
+        results = []
+        offset = 0
+        for blocks in doc_blocks:
+            tokens = flat_tokens[offset:offset + len(blocks)]
+            offset += len(blocks)
+            results.append(self._pack(blocks, tokens))
+        return results
+
+def chunk_files(file_paths: List[Path]) -> List[List[Path]]:
+    """Chunk processed files for ingestion.
+
+    A file that fits in one chunk is returned as is; larger files are split into
+    `<stem>_partNNN.txt` files under CHUNK_DIR. Returns the chunk paths per input file.
+    """
+    chunker = TextChunker()
+    texts = [Path(path).read_text(encoding='utf-8', errors='ignore') for path in file_paths]
+    os.makedirs(config.CHUNK_DIR, exist_ok=True)
+
+    results = []
+    for path, chunks in zip(file_paths, chunker.chunk_many(texts)):
+        path = Path(path)
+        if len(chunks) <= 1:
+            results.append([path])
+            continue
+        chunk_paths = []
+        for i, chunk in enumerate(chunks, start=1):
+            chunk_path = config.CHUNK_DIR / f"{path.stem}_part{i:03d}.txt"
+            chunk_path.write_text(chunk, encoding='utf-8')
+            chunk_paths.append(chunk_path)
+        logger.info(f"Split {path.name} into {len(chunk_paths)} chunks")
+        results.append(chunk_paths)
+    return results
+
+def document_name(chunk_name: str) -> str:
+    """Name of the document in OUTPUT_DIR that a chunk file was split from."""
+    match = CHUNK_NAME_RE.match(chunk_name)
+    return f"{match['stem']}.txt" if match else chunk_name
+
+def chunk_file(file_path: Path) -> List[Path]:
+    """Chunk a single processed file for ingestion."""
+    return chunk_files([file_path])[0]
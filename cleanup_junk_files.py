@@ -5,6 +5,10 @@ Cleanup script to remove junk files with minimal content from scraped data
 import os
 from pathlib import Path
 from loguru import logger
+from content_index import content_index
+from near_dup import near_dup_index
+from file_index import file_index
+from bm25_index import bm25_index
 
 def cleanup_junk_files(directory: Path, min_content_length: int = 50, dry_run: bool = True):
     """
@@ -35,6 +39,10 @@ def cleanup_junk_files(directory: Path, min_content_length: int = 50, dry_run: b
                     logger.info(f"WOULD DELETE: {file_path.name} ({content_length} chars, {file_size} bytes)")
                 else:
                     file_path.unlink()
+                    content_index.forget_path(file_path.resolve())
+                    near_dup_index.forget_path(file_path.resolve())
+                    file_index.forget(file_path)
+                    bm25_index.remove(file_path)
                     logger.info(f"DELETED: {file_path.name} ({content_length} chars, {file_size} bytes)")
                     
         except Exception as e:
@@ -11,18 +11,123 @@ class Config:
         # Use user-writable directories
         self.OUTPUT_DIR = self.BASE_DIR / "processed_files"
         self.LOG_DIR = Path.home() / ".rag_scraper_logs"
+        self.DATA_DIR = self.BASE_DIR / "data"  # Persistent state (job queue, indexes)
         
         # Text processing settings
         self.MAX_CHUNK_SIZE = 2000  # Maximum tokens per chunk
         self.CHUNK_OVERLAP = 100   # Token overlap between chunks
+        self.TOKEN_ENCODING = "cl100k_base"  # tiktoken encoding used to count tokens
+        self.TOKENIZER_THREADS = 4  # Threads used for batched encoding
+        self.CHUNK_DIR = self.OUTPUT_DIR / "chunks"  # Chunk files for documents larger than one chunk
         
         # Web scraping settings
         self.REQUEST_TIMEOUT = 30   # Seconds
         self.MAX_RETRIES = 3        # Retry attempts for failed requests
         self.CONCURRENT_REQUESTS = 5  # Number of concurrent web requests
+        self.CONCURRENT_REQUESTS_PER_HOST = 2  # Concurrent requests against one host
+        self.PER_HOST_DELAY = 1.0  # Minimum seconds between requests to one host
+        self.HTML_PARSER = "lxml"  # HTML cleaning backend: "lxml" (fast) or "bs4"
+        self.HTML_MAIN_CONTENT = True  # Keep only the main article text instead of the whole page (lxml backend)
+        self.HTML_PARSE_EXECUTOR = "process"  # Pool that cleans HTML off the event loop: "process" or "thread"
+        self.HTML_PARSE_WORKERS = os.cpu_count() or 2  # Workers in the HTML parse pool
+        self.HTML_PARSE_BACKLOG = 16  # Pages allowed between reading their body and the end of parsing
+
+        # Crawl settings
+        self.CRAWL_MAX_DEPTH = 3        # Default link hops followed from the seed URLs
+        self.CRAWL_MAX_PAGES = 500      # Default pages fetched per crawl
+        self.CRAWL_PAGE_LIMIT = 10000   # Largest max_pages a crawl request may ask for
+        self.CRAWL_RESPECT_ROBOTS = True  # Skip URLs disallowed by the site's robots.txt
+        self.CRAWL_ROBOTS_MAX_BYTES = 512 * 1024  # Largest robots.txt read
+        self.CRAWL_LINKS_PATH = self.DATA_DIR / "crawl_links.db"  # Links of crawled pages, followed again when a page is unchanged
+
+        # Sitemap and feed settings
+        self.FEED_STATE_PATH = self.DATA_DIR / "feed_state.db"  # lastmod watermarks of sitemap and feed entries
+        self.FEED_MAX_BYTES = 100 * 1024 * 1024  # Largest decompressed sitemap or feed document
+        self.FEED_MAX_DEPTH = 2         # Levels of nested sitemap indexes followed
+        self.FEED_BATCH_SIZE = 5000     # Entries parsed, diffed and scraped per step of a large feed
+        self.FEED_MARK_BATCH = 100      # Scraped entries per watermark update
+
+        # HTTP connection pool settings (shared across all scrape jobs)
+        self.HTTP_POOL_SIZE = 100          # Total open connections per session
+        self.HTTP_POOL_SIZE_PER_HOST = 10  # Open connections per host
+        self.HTTP_KEEPALIVE_TIMEOUT = 30   # Seconds to keep idle connections alive
+        self.HTTP_DNS_CACHE_TTL = 300      # Seconds to cache DNS lookups
+        
+        # Open WebUI ingestion settings
+        self.COLLECTION_CACHE_TTL = 300  # Seconds a resolved collection ID is reused
+        self.INGEST_CONCURRENCY = 8      # Concurrent uploads to Open WebUI
+        self.INGEST_BACKOFF_BASE = 0.5   # Initial spacing (seconds) after a 429/5xx response
+        self.INGEST_BACKOFF_MAX = 30.0   # Upper bound on spacing between requests
+        self.INGEST_MAX_RETRIES = 5      # Attempts per request on 429/5xx responses
+        self.INGEST_BREAKER_THRESHOLD = 5  # Consecutive connection errors/5xx that open the circuit
+        self.INGEST_BREAKER_RESET = 30.0   # Seconds the circuit stays open before a probe request
+        self.OUTBOX_PATH = self.DATA_DIR / "ingest_outbox.db"  # Documents whose ingestion is pending a retry
+        self.OUTBOX_RETRY_BASE = 5.0     # Base delay before retrying a parked document
+        self.OUTBOX_RETRY_MAX = 600.0    # Upper bound on that delay
+        self.OUTBOX_MAX_ATTEMPTS = 20    # Attempts before a parked document is left for inspection
+        
+        # Download limits
+        self.MAX_HTML_BYTES = 10 * 1024 * 1024  # Largest page body read before aborting
+        self.MAX_PDF_BYTES = 100 * 1024 * 1024  # Largest PDF download before aborting
+        self.DOWNLOAD_CHUNK_SIZE = 64 * 1024    # Bytes read per step while streaming a body
+        self.HTML_CONTENT_TYPES = ["text/html", "application/xhtml+xml", "text/plain"]  # Accepted page types
+        self.PDF_CONTENT_TYPES = ["application/pdf", "application/x-pdf", "application/octet-stream"]  # Accepted PDF types
+
+        # Local embedding settings
+        self.LOCAL_EMBEDDING = os.getenv("LOCAL_EMBEDDING", "false").lower() == "true"  # Also embed ingested chunks into ChromaDB
+        self.EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # Same model Open WebUI embeds with
+        self.EMBEDDING_DEVICE = "cpu"   # torch device for the embedding model
+        self.EMBEDDING_BATCH_SIZE = 64  # Texts encoded per batch
+        self.EMBEDDING_BATCH_WAIT = 0.05  # Seconds to wait for more texts to fill a batch
+        self.EMBEDDING_THREADS = os.cpu_count() or 2  # torch intra-op threads
+        self.CHROMA_COLLECTION = "rag_documents"  # ChromaDB collection for local embeddings
+        self.CHROMA_PATH = self.DATA_DIR / "chroma"  # Local ChromaDB store when no CHROMADB_HOST is set
+        self.EMBEDDING_CACHE_DIR = self.DATA_DIR / "embedding_cache"  # Vectors by (model, text hash), reused across re-scrapes
+
+        # Local search settings
+        self.VECTOR_INDEX_DIR = self.DATA_DIR / "vector_index"  # Memory-mapped chunk embeddings for /api/search
+        self.SEARCH_TOP_K = 10          # Default number of /api/search results
+        self.SEARCH_MAX_TOP_K = 100     # Upper bound on the requested number of results
+        self.SEARCH_SNIPPET_CHARS = 300  # Characters of each chunk kept for search results
+        self.SEARCH_CANDIDATES = 50     # Results taken from each retriever before fusion
+        self.RRF_K = 60                 # Reciprocal-rank fusion constant: higher flattens rank differences
+        self.BM25_INDEX_PATH = self.DATA_DIR / "bm25_index.db"  # Inverted index of documents in OUTPUT_DIR
+        self.BM25_K1 = 1.2              # BM25 term-frequency saturation
+        self.BM25_B = 0.75              # BM25 document-length normalization
+        self.BM25_MERGE_FACTOR = 10     # Index segments per tier before they are merged
+        self.ANN_MIN_ROWS = 200_000     # Use the IVF index (once built) from this many vectors
+        self.ANN_NPROBE = 16            # IVF clusters scanned per query
+        self.ANN_TRAIN_SAMPLE = 100_000  # Vectors sampled to train the IVF clusters
+        self.ANN_TRAIN_ITERATIONS = 10  # k-means iterations when building the IVF index
+
+        # File listing settings
+        self.FILE_INDEX_PATH = self.DATA_DIR / "file_index.db"  # Metadata of documents in OUTPUT_DIR
+        self.FILES_PAGE_SIZE = 100      # Default page size of /api/files
+        self.FILES_MAX_PAGE_SIZE = 1000  # Largest page /api/files will return
+
+        # HTTP cache settings
+        self.HTTP_CACHE_PATH = self.DATA_DIR / "http_cache.db"  # Validators for conditional re-fetches
+        
+        # Deduplication settings
+        self.CONTENT_INDEX_PATH = self.DATA_DIR / "content_index.db"
+        self.NEAR_DUP_INDEX_PATH = self.DATA_DIR / "near_dup.db"
+        self.NEAR_DUP_THRESHOLD = 0.85  # Estimated Jaccard similarity that counts as a near-duplicate
+        self.NEAR_DUP_NUM_PERM = 128    # MinHash permutations per signature
+        self.NEAR_DUP_BANDS = 16        # LSH bands (NUM_PERM / BANDS rows per band)
+        self.NEAR_DUP_SHINGLE_SIZE = 5  # Words per shingle
+        
+        # Background job settings
+        self.JOB_DB_PATH = self.DATA_DIR / "jobs.db"
+        self.JOB_WORKERS = 4          # Fixed number of background worker threads
+        self.JOB_MAX_ATTEMPTS = 3     # Times an interrupted job is retried after a restart
+        self.JOB_POLL_INTERVAL = 2.0  # Seconds an idle worker waits before re-checking the queue
+        self.JOB_DB_BACKOFF_MAX = 60.0  # Upper bound on a worker's wait after the job database stays locked
         
         # PDF processing settings
         self.PDF_MAX_PAGES = 1000   # Maximum pages to process from a PDF
+        self.PDF_WORKERS = os.cpu_count() or 2  # Processes in the PDF extraction pool
+        self.PDF_TIMEOUT = 300      # Seconds allowed to extract a single document
+        self.PDF_MIN_PAGES_PER_TASK = 16  # Smallest page range handed to one pool process
         
         # Logging settings
         self.LOG_LEVEL = "INFO"
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+from config import config
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    content_hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    ingested INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+def hash_lines(lines: Iterable[str]) -> str:
+    """SHA-256 of the whitespace-normalized text, computed incrementally.
+
+    Equivalent to hashing " ".join(text.split()), so reflowed or re-indented
+    copies of the same text hash the same.
+    """
+    digest = hashlib.sha256()
+    first = True
+    for line in lines:
+        for word in line.split():
+            if not first:
+                digest.update(b" ")
+            digest.update(word.encode('utf-8'))
+            first = False
+    return digest.hexdigest()
+
+def content_hash(text: str) -> str:
+    """Hash of the normalized text of a document."""
+    return hash_lines([text])
+
+def file_content_hash(path: Path) -> str:
+    """Hash of the normalized text of a file, streamed line by line."""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return hash_lines(f)
+
+class ContentIndex(SQLiteStore):
+    """Persistent content-addressed index of ingested documents.
+
+    Maps the hash of each document's normalized text to the file it was first
+    saved to, and each source URL to the hash of its latest text, and whether that file has been handed to Open WebUI yet. A copy
+    that was saved but never ingested (no API key, or the process died before
+    the upload) is handed back for ingestion rather than suppressed.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._create(SCHEMA)
+        with self._connect() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(contents)")]
+            if "ingested" not in columns:
+                # Indexes from before ingestion was tracked only held documents that had been ingested
+                conn.execute("ALTER TABLE contents ADD COLUMN ingested INTEGER NOT NULL DEFAULT 1")
+
+    def source_hash(self, source: str) -> Optional[str]:
+        """Hash of the latest content saved for a source."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT content_hash FROM sources WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, digest: str) -> Optional[Tuple[str, bool]]:
+        """(path, ingested) of the indexed copy of `digest`, if any."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT path, ingested FROM contents WHERE content_hash = ?", (digest,)).fetchone()
+        return (row[0], bool(row[1])) if row else None
+
+    def claim(self, source: str, digest: str, path: Path) -> Optional[Tuple[str, bool]]:
+        """Record `path` as the copy of `digest` unless that content is already indexed.
+
+        Returns (path, ingested) of the existing copy for a duplicate, otherwise None.
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT path, ingested FROM contents WHERE content_hash = ?", (digest,)).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO contents (content_hash, path, source, created_at, ingested) VALUES (?, ?, ?, ?, 0)",
+                    (digest, str(path), source, time.time()),
+                )
+            conn.execute(
+                "INSERT INTO sources (source, content_hash, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET content_hash = excluded.content_hash, updated_at = excluded.updated_at",
+                (source, digest, time.time()),
+            )
+            conn.execute("COMMIT")
+        return (row[0], bool(row[1])) if row else None
+
+    def mark_ingested(self, path: Path):
+        """Record that a saved file was handed to Open WebUI (delivered, or parked in the outbox for retry)."""
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE contents SET ingested = 1 WHERE path = ?", (str(path),))
+
+    def forget_path(self, path: Path):
+        """Drop index entries for a file that was deleted, so its content can be ingested again."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM contents WHERE path = ?", (str(path),))
+
+# Global content index instance
+content_index = ContentIndex(config.CONTENT_INDEX_PATH)
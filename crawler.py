@@ -0,0 +1,246 @@
+import asyncio
+import itertools
+import posixpath
+import re
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+from loguru import logger
+from config import config
+from sqlite_store import SQLiteStore
+from fetch_scheduler import fetch_scheduler
+from http_session import DEFAULT_HEADERS, read_limited
+from web_scraper import ScrapedPage, WebScraper
+
+# Query parameters that only track campaigns or clicks and never change the page
+TRACKING_PARAMS = {
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'ref_src',
+}
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+# Links to files that are neither HTML nor PDF are not worth fetching
+SKIPPED_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.bmp', '.css', '.js', '.json', '.xml', '.rss',
+    '.zip', '.gz', '.tgz', '.tar', '.bz2', '.7z', '.rar', '.exe', '.dmg', '.iso', '.deb', '.rpm', '.apk',
+    '.mp3', '.mp4', '.m4a', '.wav', '.avi', '.mov', '.webm', '.woff', '.woff2', '.ttf', '.eot',
+}
+# Characters left as they are when re-quoting a path
+PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """Canonical form of an http(s) URL, so each page is recognised whatever link led to it.
+
+    Lower-cases the scheme and host, drops credentials, default ports, the
+    fragment and tracking parameters, resolves dot segments, normalizes
+    percent-encoding and sorts the remaining query parameters. Returns None
+    for other schemes and malformed URLs.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.rstrip('.')
+    netloc = f"[{host}]" if ':' in host else host
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc += f":{port}"
+
+    path = posixpath.normpath(parts.path) if parts.path else '/'
+    path = '/' + path.lstrip('/')  # normpath keeps a leading '//'
+    if parts.path.endswith('/') and path != '/':
+        path += '/'
+    path = re.sub(r'%[0-9a-f]{2}', lambda m: m.group().upper(), quote(path, safe=PATH_SAFE))
+
+    params = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(params)), ''))
+
+def site_of(url: str) -> str:
+    """Host a URL belongs to for crawl scoping; www. and the bare domain count as one site."""
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_links (
+    url TEXT PRIMARY KEY,
+    links TEXT NOT NULL,
+    crawled_at REAL NOT NULL
+);
+"""
+
+class LinkStore(SQLiteStore):
+    """Outgoing links of crawled pages.
+
+    Pages that revalidate as unchanged are not parsed again, so their links are
+    kept from the last crawl that did parse them; otherwise a re-crawl would
+    stop at every unchanged page.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._create(SCHEMA)
+
+    def get(self, url: str) -> List[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT links FROM page_links WHERE url = ?", (url,)).fetchone()
+        return row[0].split('\n') if row and row[0] else []
+
+    def put(self, url: str, links: List[str]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO page_links (url, links, crawled_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET links = excluded.links, crawled_at = excluded.crawled_at",
+                (url, '\n'.join(links), time.time()),
+            )
+
+# Global link store instance
+link_store = LinkStore(config.CRAWL_LINKS_PATH)
+
+class Crawler:
+    """Follows links from seed URLs across the seeds' sites, fetching each page once.
+
+    The frontier is a priority queue ordered by depth, then by whether a URL is
+    under one of its seed's directories, so the pages closest to what was asked
+    for are fetched before the page budget runs out. URLs are canonicalized
+    before the seen-set check, and fetches go through WebScraper, so the fetch
+    scheduler's global and per-host limits and the HTTP cache apply as usual.
+    """
+
+    def __init__(self, scraper: WebScraper, max_depth: int = config.CRAWL_MAX_DEPTH,
+                 max_pages: int = config.CRAWL_MAX_PAGES, workers: int = config.CONCURRENT_REQUESTS):
+        self.scraper = scraper
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+        self.seen: set = set()
+        self._crawled: set = set()  # Canonical URLs of the pages fetched, after redirects
+        self.fetched = 0
+        self._scopes: Dict[str, List[str]] = {}
+        self._frontier: Optional[asyncio.PriorityQueue] = None
+        self._order = itertools.count()
+        self._robots: Dict[str, asyncio.Future] = {}
+
+    def _enqueue(self, url: str, depth: int):
+        canonical = canonicalize_url(url)
+        if not canonical or canonical in self.seen:
+            return
+        site, path = site_of(canonical), urlsplit(canonical).path
+        if site not in self._scopes or posixpath.splitext(path)[1].lower() in SKIPPED_EXTENSIONS:
+            return
+        self.seen.add(canonical)
+        off_path = not any(path.startswith(prefix) for prefix in self._scopes[site])
+        self._frontier.put_nowait((depth, off_path, next(self._order), canonical))
+
+    async def crawl(self, seeds: List[str], on_page: Callable[[ScrapedPage], Awaitable[Any]]) -> Dict[str, Any]:
+        """Crawl from `seeds`, passing every page with new content to `on_page` as it arrives.
+
+        Returns the number of pages fetched and URLs discovered, and the result
+        of `on_page` per page URL.
+        """
+        self._frontier = asyncio.PriorityQueue()
+        for seed in seeds:
+            canonical = canonicalize_url(seed)
+            if canonical:
+                path = urlsplit(canonical).path
+                self._scopes.setdefault(site_of(canonical), []).append(path if path.endswith('/') else posixpath.dirname(path) + '/')
+        for seed in seeds:
+            self._enqueue(seed, 0)
+
+        handlers: Dict[str, asyncio.Task] = {}
+        workers = [asyncio.create_task(self._work(on_page, handlers)) for _ in range(self.workers)]
+        await self._frontier.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Handlers run beside the crawl (e.g. ingesting finished pages); wait for the stragglers
+        outcomes = await asyncio.gather(*handlers.values(), return_exceptions=True)
+        results = {}
+        for url, outcome in zip(handlers, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Handling crawled page {url} failed: {outcome}")
+            else:
+                results[url] = outcome
+        logger.info(f"Crawl finished: {self.fetched} pages fetched, {len(self.seen)} URLs discovered, {len(results)} pages handled")
+        return {"pages": self.fetched, "discovered": len(self.seen), "results": results}
+
+    async def _work(self, on_page: Callable[[ScrapedPage], Awaitable[Any]], handlers: Dict[str, asyncio.Task]):
+        while True:
+            depth, _, _, url = await self._frontier.get()
+            try:
+                if self.fetched >= self.max_pages or not await self._allowed(url):
+                    continue
+                self.fetched += 1
+                page = await self.scraper.scrape_page(url, with_links=True)
+                target = canonicalize_url(page.url) or page.url
+                if page.url != url:
+                    # Redirected: remember the target, and only handle it if it stayed on a crawled site
+                    self.seen.add(target)
+                    if site_of(page.url) not in self._scopes:
+                        logger.info(f"{url} redirects off the crawled sites to {page.url}; skipping.")
+                        page.discard()
+                        continue
+                if target in self._crawled:
+                    # Another URL already redirected here, so this page was handled once
+                    page.discard()
+                    continue
+                self._crawled.add(target)
+                if page.text is None:
+                    links = link_store.get(url)
+                elif page.has_content:
+                    links = page.links
+                    link_store.put(url, links)
+                    handlers[page.url] = asyncio.create_task(self._handle(page, on_page))
+                else:
+                    links = []
+                if depth < self.max_depth:
+                    for link in links:
+                        self._enqueue(link, depth + 1)
+            except Exception as e:
+                logger.error(f"Error crawling {url}: {e}")
+            finally:
+                self._frontier.task_done()
+
+    @staticmethod
+    async def _handle(page: ScrapedPage, on_page: Callable[[ScrapedPage], Awaitable[Any]]) -> Any:
+        result = await on_page(page)
+        # Only a handled page may revalidate as unchanged next time
+        page.commit()
+        return result
+
+    async def _allowed(self, url: str) -> bool:
+        if not config.CRAWL_RESPECT_ROBOTS:
+            return True
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._robots:
+            self._robots[origin] = asyncio.ensure_future(self._fetch_robots(origin))
+        parser = await self._robots[origin]
+        if not parser.can_fetch(DEFAULT_HEADERS['User-Agent'], url):
+            logger.info(f"robots.txt disallows {url}; skipping.")
+            return False
+        return True
+
+    async def _fetch_robots(self, origin: str) -> RobotFileParser:
+        """robots.txt of an origin, following RobotFileParser.read's rules for missing or forbidden files."""
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            async with fetch_scheduler.slot(origin):
+                async with self.scraper.session.get(f"{origin}/robots.txt") as response:
+                    if response.status in (401, 403):
+                        parser.disallow_all = True
+                    elif response.status >= 400:
+                        parser.allow_all = True
+                    else:
+                        body = await read_limited(f"{origin}/robots.txt", response, config.CRAWL_ROBOTS_MAX_BYTES)
+                        parser.parse(body.decode('utf-8', errors='ignore').splitlines())
+        except Exception as e:
+            logger.warning(f"Could not read {origin}/robots.txt ({e}); crawling without it")
+            parser.allow_all = True
+        return parser
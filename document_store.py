@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+from loguru import logger
+from config import config
+from content_index import content_index, content_hash, file_content_hash
+from near_dup import near_dup_index
+from file_index import file_index
+from bm25_index import bm25_index
+
+def has_text(path: Path, block_size: int = 64 * 1024) -> bool:
+    """Checks whether a file contains any non-whitespace bytes without loading it whole."""
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            if block.strip():
+                return True
+    return False
+
+def _pending_copy(source: str, existing: tuple) -> Path | None:
+    """The earlier copy of a duplicate if it still needs ingesting, otherwise None."""
+    path, ingested = Path(existing[0]), existing[1]
+    if not ingested and path.exists():
+        logger.info(f"Content of {source} matches {path.name}, which was saved but never ingested; ingesting it.")
+        return path
+    logger.info(f"Content of {source} duplicates {path.name}; skipping.")
+    return None
+
+def save_text(source: str, text: str, is_file: bool = False) -> Path | None:
+    """Save a document's text to the output directory unless identical content was already ingested.
+
+    Returns the new output path, or None when the text duplicates an indexed
+    document. A duplicate of a file that was saved but never ingested returns
+    that file's path instead, so the caller ingests it this time.
+    """
+    digest = content_hash(text)
+    if content_index.source_hash(source) == digest:
+        # Unchanged since this source was last saved, the common case on a re-scrape:
+        # settled by reads alone, without taking the index's write lock
+        existing = content_index.lookup(digest)
+        if existing:
+            return _pending_copy(source, existing)
+
+    output_path = config.get_output_path(source, is_file=is_file)
+    existing = content_index.claim(source, digest, output_path)
+    if existing:
+        return _pending_copy(source, existing)
+
+    match = near_dup_index.check_and_add(source, output_path, text.splitlines())
+    if match:
+        content_index.forget_path(output_path)
+        logger.info(f"Content of {source} near-duplicates {Path(match[0]).name} ({match[1]:.0%} similar); linked, not saved.")
+        return None
+
+    try:
+        os.makedirs(output_path.parent, exist_ok=True)
+        output_path.write_text(text, encoding='utf-8')
+    except Exception:
+        content_index.forget_path(output_path)
+        near_dup_index.forget_path(output_path)
+        raise
+    file_index.record(output_path, source)
+    bm25_index.add(output_path, text)
+    return output_path
+
+def register_file(source: str, output_path: Path) -> Path | None:
+    """Index a file that was streamed to disk, deleting it if its content was already ingested.
+
+    Returns the path if it holds new content, otherwise None (or, as in
+    save_text, the earlier copy if that was never ingested).
+    """
+    digest = file_content_hash(output_path)
+    existing = content_index.claim(source, digest, output_path)
+    if existing and Path(existing[0]) != output_path:
+        output_path.unlink(missing_ok=True)
+        return _pending_copy(source, existing)
+
+    with open(output_path, 'r', encoding='utf-8', errors='ignore') as f:
+        match = near_dup_index.check_and_add(source, output_path, f)
+    if match:
+        content_index.forget_path(output_path)
+        logger.info(f"Content of {source} near-duplicates {Path(match[0]).name} ({match[1]:.0%} similar); linked, removing {output_path.name}.")
+        output_path.unlink(missing_ok=True)
+        return None
+    file_index.record(output_path, source)
+    bm25_index.add(output_path)
+    return output_path
@@ -0,0 +1,104 @@
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Sequence
+import numpy as np
+from sqlite_store import PARAM_BATCH, SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    hash BLOB PRIMARY KEY,
+    row INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    rows INTEGER NOT NULL,
+    dim INTEGER
+);
+INSERT OR IGNORE INTO meta (id, rows, dim) VALUES (0, 0, NULL);
+"""
+
+class EmbeddingCache(SQLiteStore):
+    """Persistent cache of one model's embeddings, keyed by the SHA-256 of the embedded text.
+
+    Vectors are appended to a float32 file read through a memory map; the hash
+    index mapping a text hash to its row is a SQLite table of 32-byte keys. Each
+    model gets its own directory, so the cache key is effectively (model, hash).
+    """
+
+    def __init__(self, directory: Path, model_name: str):
+        self.directory = Path(directory) / re.sub(r"[^\w.-]+", "_", model_name)
+        self.db_path = self.directory / "index.db"
+        self.vectors_path = self.directory / "vectors.f32"
+        self._create(SCHEMA)
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def _map(self, rows: int, dim: int) -> np.ndarray:
+        """Memory map covering at least `rows` rows, re-mapped only after the file has grown."""
+        with self._lock:
+            if self._matrix is None or len(self._matrix) < rows:
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+            return self._matrix
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for the given hex digests; missing ones are left out."""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            rows, dim = conn.execute("SELECT rows, dim FROM meta WHERE id = 0").fetchone()
+            for i in range(0, len(hashes), PARAM_BATCH):
+                keys = [bytes.fromhex(digest) for digest in hashes[i:i + PARAM_BATCH]]
+                found.update(conn.execute(
+                    f"SELECT hash, row FROM entries WHERE hash IN ({','.join('?' * len(keys))})", keys
+                ))
+            conn.execute("COMMIT")
+        if not found:
+            return {}
+        matrix = self._map(rows, dim)
+        return {key.hex(): np.array(matrix[row]) for key, row in found.items()}
+
+    def put_many(self, hashes: Sequence[str], vectors: np.ndarray):
+        """Store vectors under their text's hex digest; hashes already cached are kept as they are."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(hashes):
+            return
+        with self._connect() as conn:
+            # The write lock also serializes appends to the vector file across processes
+            conn.execute("BEGIN IMMEDIATE")
+            rows, dim = conn.execute("SELECT rows, dim FROM meta WHERE id = 0").fetchone()
+            dim = dim or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                conn.execute("ROLLBACK")
+                raise ValueError(f"Embedding cache holds {dim}-dimensional vectors, got {vectors.shape[1]}")
+            keys = [bytes.fromhex(digest) for digest in hashes]
+            existing = set()
+            for i in range(0, len(keys), PARAM_BATCH):
+                batch = keys[i:i + PARAM_BATCH]
+                existing.update(key for (key,) in conn.execute(
+                    f"SELECT hash FROM entries WHERE hash IN ({','.join('?' * len(batch))})", batch
+                ))
+            new = {}
+            for position, key in enumerate(keys):
+                if key not in existing and key not in new:
+                    new[key] = position
+            if not new:
+                conn.execute("COMMIT")
+                return
+            with open(self.vectors_path, "ab") as f:
+                # Drop rows a crashed writer appended but never committed
+                f.truncate(rows * dim * 4)
+                f.write(np.ascontiguousarray(vectors[list(new.values())]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            conn.executemany(
+                "INSERT INTO entries (hash, row) VALUES (?, ?)", [(key, rows + i) for i, key in enumerate(new)]
+            )
+            conn.execute("UPDATE meta SET rows = ?, dim = ? WHERE id = 0", (rows + len(new), dim))
+            conn.execute("COMMIT")
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT rows FROM meta WHERE id = 0").fetchone()[0]
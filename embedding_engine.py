@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Local embedding engine: embeds document chunks on CPU and writes them to ChromaDB
+and the local search index
+"""
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from loguru import logger
+from config import config
+from vector_index import vector_index
+from embedding_cache import EmbeddingCache
+
+try:
+    import chromadb
+    import torch
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover - both are in requirements.txt; only this engine needs them
+    chromadb = None
+
+# ChromaDB server from docker-compose; without a host a local persistent store is used
+CHROMADB_HOST = os.getenv("CHROMADB_HOST")
+CHROMADB_PORT = int(os.getenv("CHROMADB_PORT", "8000"))
+
+def document_id(path: Path) -> str:
+    """Stable ID of a document or chunk file; re-embedding the same file replaces its entry."""
+    return Path(path).stem
+
+class EmbeddingEngine:
+    """
+    Embeds text in batches with a local sentence-transformers model and
+    upserts the vectors into a ChromaDB collection and the local vector index.
+
+    Writes are idempotent by document ID: documents whose ID is already stored
+    with the same content hash and model are skipped without being embedded,
+    and changed ones are replaced in place. `submit` coalesces small requests
+    from concurrent jobs into full batches on a background thread.
+    """
+
+    def __init__(self, model_name: str = config.EMBEDDING_MODEL, batch_size: int = config.EMBEDDING_BATCH_SIZE,
+                 threads: int = config.EMBEDDING_THREADS, collection_name: str = config.CHROMA_COLLECTION):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads
+        self.collection_name = collection_name
+        self._model = None
+        self._collection = None
+        self.cache = EmbeddingCache(config.EMBEDDING_CACHE_DIR, model_name)
+        # One encode at a time: torch already spreads a batch across `threads` cores
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        self._requests: "queue.Queue[tuple[list[Path], Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                if chromadb is None:
+                    raise RuntimeError("chromadb and sentence-transformers are required for local embedding")
+                torch.set_num_threads(self.threads)
+                logger.info(f"Loading embedding model {self.model_name} on {config.EMBEDDING_DEVICE} with {self.threads} threads")
+                self._model = SentenceTransformer(self.model_name, device=config.EMBEDDING_DEVICE)
+        return self._model
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            if chromadb is None:
+                raise RuntimeError("chromadb and sentence-transformers are required for local embedding")
+            if CHROMADB_HOST:
+                client = chromadb.HttpClient(host=CHROMADB_HOST, port=CHROMADB_PORT)
+            else:
+                client = chromadb.PersistentClient(path=str(config.CHROMA_PATH))
+            # Vectors are always supplied, so Chroma never needs its own embedding function
+            self._collection = client.get_or_create_collection(
+                self.collection_name, metadata={"hnsw:space": "cosine"}, embedding_function=None
+            )
+        return self._collection
+
+    def _stale_ids(self, metadatas: Dict[str, dict]) -> List[str]:
+        """IDs whose stored entry is missing, was embedded from other content or another model,
+        or has no vector in the local search index."""
+        stored = self.collection.get(ids=list(metadatas), include=["metadatas"])
+        current = {
+            doc_id for doc_id, meta in zip(stored["ids"], stored["metadatas"])
+            if meta and meta.get("content_hash") == metadatas[doc_id]["content_hash"] and meta.get("model") == self.model_name
+        }
+        current &= vector_index.live_ids(current)
+        return [doc_id for doc_id in metadatas if doc_id not in current]
+
+    def embed_documents(self, documents: Dict[str, str], sources: Optional[Dict[str, str]] = None) -> int:
+        """Embed and upsert documents given as {document ID: text}; returns how many were (re)embedded.
+
+        Only texts missing from the embedding cache are run through the model.
+        """
+        metadatas = {
+            doc_id: {
+                "content_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                "model": self.model_name,
+                "source": (sources or {}).get(doc_id, doc_id),
+            }
+            for doc_id, text in documents.items() if text.strip()
+        }
+        if not metadatas:
+            return 0
+        with self._lock:
+            pending = self._stale_ids(metadatas)
+            if not pending:
+                logger.info(f"All {len(metadatas)} documents are already embedded; nothing to do.")
+                return 0
+            started = time.monotonic()
+            # Re-scraped or re-chunked documents mostly repeat chunks embedded before under other IDs
+            cached = self.cache.get_many([metadatas[doc_id]["content_hash"] for doc_id in pending])
+            misses = {}
+            for doc_id in pending:
+                if metadatas[doc_id]["content_hash"] not in cached:
+                    # Identical texts under several IDs are encoded once
+                    misses.setdefault(metadatas[doc_id]["content_hash"], doc_id)
+            misses = list(misses.values())
+            for start in range(0, len(misses), self.batch_size):
+                ids = misses[start:start + self.batch_size]
+                embeddings = self.model.encode(
+                    [documents[doc_id] for doc_id in ids], batch_size=self.batch_size, convert_to_numpy=True,
+                    normalize_embeddings=True, show_progress_bar=False,
+                )
+                hashes = [metadatas[doc_id]["content_hash"] for doc_id in ids]
+                self.cache.put_many(hashes, embeddings)
+                cached.update(zip(hashes, embeddings))
+            for start in range(0, len(pending), self.batch_size):
+                ids = pending[start:start + self.batch_size]
+                texts = [documents[doc_id] for doc_id in ids]
+                embeddings = np.stack([cached[metadatas[doc_id]["content_hash"]] for doc_id in ids])
+                self.collection.upsert(
+                    ids=ids, embeddings=embeddings.tolist(), documents=texts,
+                    metadatas=[metadatas[doc_id] for doc_id in ids],
+                )
+                vector_index.add(
+                    ids, embeddings, [metadatas[doc_id]["source"] for doc_id in ids],
+                    [text[:config.SEARCH_SNIPPET_CHARS] for text in texts],
+                )
+            elapsed = time.monotonic() - started
+        logger.info(
+            f"Embedded {len(misses)} documents ({len(pending) - len(misses)} from cache, "
+            f"{len(metadatas) - len(pending)} unchanged) in {elapsed:.1f}s ({len(pending) / max(elapsed, 1e-9):.1f} docs/s)"
+        )
+        return len(pending)
+
+    def embed_query(self, text: str):
+        """Embed a search query with the same model and normalization as the documents."""
+        # Not serialized with batch encodes: a query should not wait behind a full batch
+        return self.model.encode([text], convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)[0]
+
+    def embed_files(self, paths: Iterable[Path]) -> int:
+        """Embed text files (typically chunk files), keyed by their document ID."""
+        documents, sources = {}, {}
+        for path in paths:
+            path = Path(path)
+            documents[document_id(path)] = path.read_text(encoding="utf-8", errors="ignore")
+            sources[document_id(path)] = path.name
+        return self.embed_documents(documents, sources)
+
+    def submit(self, paths: Iterable[Path]) -> Future:
+        """Queue files for embedding on the background batcher; the future resolves once their batch is stored."""
+        future = Future()
+        self._requests.put((list(paths), future))
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+                self._worker.start()
+        return future
+
+    def _batch_loop(self):
+        while True:
+            requests = [self._requests.get()]
+            # Wait briefly for other jobs' chunks so the model sees full batches
+            deadline = time.monotonic() + config.EMBEDDING_BATCH_WAIT
+            while sum(len(paths) for paths, _ in requests) < self.batch_size:
+                try:
+                    requests.append(self._requests.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                count = self.embed_files(path for paths, _ in requests for path in paths)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+            else:
+                for _, future in requests:
+                    future.set_result(count)
+
+# Global embedding engine instance
+embedding_engine = EmbeddingEngine()
+
+def main():
+    import argparse
+    from chunker import chunk_files
+
+    parser = argparse.ArgumentParser(description="Embed processed documents into ChromaDB")
+    parser.add_argument("paths", nargs="*", type=Path, help="Text files to embed (default: every .txt in the output directory)")
+    parser.add_argument("--batch-size", type=int, default=config.EMBEDDING_BATCH_SIZE, help="Texts per encode batch")
+    parser.add_argument("--threads", type=int, default=config.EMBEDDING_THREADS, help="CPU threads used by torch")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(config.OUTPUT_DIR.glob("*.txt"))
+    engine = EmbeddingEngine(batch_size=args.batch_size, threads=args.threads)
+    # Embed the same token-bounded chunks that are uploaded to Open WebUI
+    chunk_paths = [chunk for chunks in chunk_files(paths) for chunk in chunks]
+    logger.info(f"Embedding {len(chunk_paths)} chunks from {len(paths)} documents")
+    engine.embed_files(chunk_paths)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import asyncio
+import os
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from xml.etree.ElementTree import XMLPullParser
+from loguru import logger
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml is in requirements.txt; the stdlib parser is slower but equivalent
+    etree = None
+from config import config
+from sqlite_store import SQLiteStore
+from fetch_scheduler import fetch_scheduler
+from http_session import STREAMING_TIMEOUT, stream_to_file
+from web_scraper import ScrapedPage, WebScraper
+
+@dataclass
+class FeedEntry:
+    url: str
+    lastmod: Optional[str]  # UTC ISO-8601, None when the feed gives no date
+    is_sitemap: bool = False  # A child sitemap of a sitemap index rather than a page
+
+@lru_cache(maxsize=4096)
+def normalize_date(value: Optional[str]) -> Optional[str]:
+    """W3C datetime (sitemaps, Atom) or RFC 822 date (RSS) as a sortable UTC ISO-8601 string."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec='seconds')
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+# Record elements, and the child elements giving their date in order of preference
+RECORDS = {
+    'url': ('lastmod',),                       # Sitemap page
+    'sitemap': ('lastmod',),                   # Sitemap index child
+    'item': ('updated', 'date', 'pubDate'),    # RSS item (atom:updated, dc:date, pubDate)
+    'entry': ('updated', 'published'),         # Atom entry
+}
+
+class FeedParser:
+    """Incremental parser of sitemaps, sitemap indexes, RSS and Atom feeds.
+
+    Bytes are pushed in as they arrive, gzip-compressed or not, and entries
+    come out as soon as their element closes. Each record element is removed
+    from its parent once read, so memory stays flat however large the document.
+    With lxml only record elements raise events, which makes parsing several
+    times faster than the stdlib fallback.
+    """
+
+    def __init__(self, max_bytes: int = config.FEED_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        if etree is not None:
+            self._parser = etree.XMLPullParser(
+                events=('end',), tag=[f'{{*}}{name}' for name in RECORDS],
+                resolve_entities=False, no_network=True, huge_tree=True,
+            )
+        else:
+            self._parser = XMLPullParser(events=('start', 'end'))
+        self._stack: List[Any] = []
+        self._decompressor = None
+        self._sniffed = False
+
+    def feed(self, data: bytes) -> List[FeedEntry]:
+        if not self._sniffed:
+            self._sniffed = True
+            if data[:2] == b'\x1f\x8b':
+                self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        if self._decompressor:
+            # Bounded, so a small compressed body cannot expand without limit
+            data = self._decompressor.decompress(data, self.max_bytes - self.size + 1)
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise ValueError(f"Feed exceeds {self.max_bytes} bytes")
+        self._parser.feed(data)
+        return self._entries()
+
+    def close(self) -> List[FeedEntry]:
+        self._parser.close()
+        return self._entries()
+
+    def _entries(self) -> List[FeedEntry]:
+        if etree is not None:
+            return self._lxml_entries()
+        entries = []
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                self._stack.append(element)
+                continue
+            self._stack.pop()
+            name = _local(element.tag)
+            if name not in RECORDS or not self._stack:
+                continue
+            entry = self._record(name, element)
+            if entry:
+                entries.append(entry)
+            self._stack[-1].remove(element)
+        return entries
+
+    def _lxml_entries(self) -> List[FeedEntry]:
+        entries = []
+        for _, element in self._parser.read_events():
+            entry = self._record(_local(element.tag), element)
+            if entry:
+                entries.append(entry)
+            element.clear()
+            # Drop the cleared records before this one, which lxml keeps attached to the tree
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+        return entries
+
+    @staticmethod
+    def _record(name: str, element) -> Optional[FeedEntry]:
+        if name in ('url', 'sitemap'):
+            # The bulk of any large document; two lookups instead of walking every child
+            url = (element.findtext('{*}loc') or '').strip()
+            if not url.startswith(('http://', 'https://')):
+                return None
+            return FeedEntry(url, normalize_date(element.findtext('{*}lastmod')), is_sitemap=name == 'sitemap')
+        children = {}
+        url = None
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue  # Comments and processing instructions
+            child_name = _local(child.tag)
+            children.setdefault(child_name, (child.text or '').strip())
+            if child_name == 'link' and url is None:
+                # RSS puts the URL in the text, Atom in href of the alternate (or unlabeled) link
+                href = child.get('href')
+                if href is None:
+                    url = (child.text or '').strip() or None
+                elif child.get('rel', 'alternate') == 'alternate':
+                    url = href.strip()
+        if not url and name == 'item':
+            # RSS items without a link often use a permalink guid
+            guid = element.find('guid')
+            if guid is not None and guid.get('isPermaLink', 'true') == 'true':
+                url = (guid.text or '').strip()
+        if not url or not url.startswith(('http://', 'https://')):
+            return None
+        lastmod = next((normalize_date(children[key]) for key in RECORDS[name] if children.get(key)), None)
+        return FeedEntry(url, lastmod, is_sitemap=name == 'sitemap')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    url TEXT PRIMARY KEY,
+    lastmod TEXT,
+    feed TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+class FeedState(SQLiteStore):
+    """Last-seen lastmod of every page and child sitemap read from a feed.
+
+    An entry counts as changed when its lastmod is newer than the stored
+    watermark. Entries without a date can only be told apart as new or already
+    seen; those pages are still revalidated by the HTTP cache when re-scraped.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._create(SCHEMA)
+
+    def changed(self, entries: List[FeedEntry]) -> List[FeedEntry]:
+        """The entries that are new, or whose lastmod is newer than their watermark."""
+        stored = {}
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            for i in range(0, len(entries), 500):
+                urls = [entry.url for entry in entries[i:i + 500]]
+                stored.update(conn.execute(
+                    f"SELECT url, lastmod FROM watermarks WHERE url IN ({','.join('?' * len(urls))})", urls
+                ))
+            conn.execute("COMMIT")
+        return [
+            entry for entry in entries
+            if entry.url not in stored or (entry.lastmod and entry.lastmod > (stored[entry.url] or ''))
+        ]
+
+    def mark(self, entries: List[FeedEntry], feed: str):
+        """Advance the watermarks of entries that were handled successfully."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO watermarks (url, lastmod, feed, synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET lastmod = COALESCE(excluded.lastmod, lastmod), "
+                "feed = excluded.feed, synced_at = excluded.synced_at",
+                [(entry.url, entry.lastmod, feed, now) for entry in entries],
+            )
+            conn.execute("COMMIT")
+
+# Global feed state instance
+feed_state = FeedState(config.FEED_STATE_PATH)
+
+class FeedReader:
+    """Scrapes the new and changed pages listed by a sitemap, sitemap index, RSS or Atom feed.
+
+    Feeds are stream-parsed as they download. Child sitemaps whose lastmod has
+    not moved are not fetched at all, so a daily refresh of a large site costs
+    the index plus whatever changed. Watermarks only advance once a page has
+    been scraped and handled, so failures are retried on the next sync.
+    """
+
+    def __init__(self, scraper: WebScraper, workers: int = config.CONCURRENT_REQUESTS):
+        self.scraper = scraper
+        self.workers = workers
+
+    async def _download(self, url: str) -> Path:
+        """Stream a feed document to a temporary file, so no connection is held open while its pages are scraped."""
+        fd, path = tempfile.mkstemp(prefix="feed_", suffix=".xml")
+        os.close(fd)
+        path = Path(path)
+        try:
+            async with fetch_scheduler.slot(url):
+                async with self.scraper.session.get(url, timeout=STREAMING_TIMEOUT) as response:
+                    response.raise_for_status()
+                    await stream_to_file(url, response, path, config.FEED_MAX_BYTES)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return path
+
+    @staticmethod
+    def _parse_batch(parser: FeedParser, f) -> Tuple[List[FeedEntry], bool]:
+        """Parse until a batch of entries is ready; also returns whether the document is finished."""
+        entries = []
+        while len(entries) < config.FEED_BATCH_SIZE:
+            chunk = f.read(config.DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                entries.extend(parser.close())
+                return entries, True
+            entries.extend(parser.feed(chunk))
+        return entries, False
+
+    async def read(self, url: str) -> AsyncIterator[List[FeedEntry]]:
+        """Entries of one feed document in batches of about FEED_BATCH_SIZE, parsed off the event loop."""
+        path = await self._download(url)
+        loop = asyncio.get_running_loop()
+        # A single thread for the whole document: lxml parsers must not move between threads
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feed-parse")
+        try:
+            with open(path, 'rb') as f:
+                parser = await loop.run_in_executor(executor, FeedParser)
+                finished = False
+                while not finished:
+                    entries, finished = await loop.run_in_executor(executor, self._parse_batch, parser, f)
+                    if entries:
+                        yield entries
+        finally:
+            executor.shutdown(wait=False)
+            path.unlink(missing_ok=True)
+
+    async def sync(self, url: str, on_page: Callable[[ScrapedPage], Awaitable[Any]]) -> Dict[str, Any]:
+        """Scrape the pages of the feed at `url` that changed since the last sync, passing each to `on_page`.
+
+        Returns counts of listed, changed and failed entries, and the result of
+        `on_page` per page URL.
+        """
+        stats = {"listed": 0, "changed": 0, "failed": 0, "documents": 0, "results": {}}
+        await self._sync(url, url, on_page, stats, depth=0)
+        logger.info(f"Feed sync of {url} finished: {stats['changed']} of {stats['listed']} entries new or changed, "
+                    f"{stats['failed']} failed, {stats['documents']} feed documents read")
+        return stats
+
+    async def _sync(self, url: str, feed: str, on_page, stats: dict, depth: int) -> bool:
+        ok = True
+        sitemaps: Dict[str, FeedEntry] = {}
+        try:
+            # Diffed and scraped a batch at a time, so memory is bounded by the batch and not the document
+            async for entries in self.read(url):
+                # Feeds may list a URL more than once; the last listing wins
+                pages = list({entry.url: entry for entry in entries if not entry.is_sitemap}.values())
+                sitemaps.update((entry.url, entry) for entry in entries if entry.is_sitemap)
+                changed = feed_state.changed(pages)
+                stats["listed"] += len(pages)
+                stats["changed"] += len(changed)
+                if pages:
+                    logger.info(f"{url}: {len(changed)} of {len(pages)} pages in this batch new or changed")
+                ok = await self._scrape(changed, feed, on_page, stats) and ok
+        except Exception as e:
+            logger.error(f"Could not read feed {url}: {e}")
+            return False
+        stats["documents"] += 1
+
+        if sitemaps and depth >= config.FEED_MAX_DEPTH:
+            logger.warning(f"Not following sitemaps nested deeper than {config.FEED_MAX_DEPTH} levels in {url}")
+            return ok
+        for child in feed_state.changed(list(sitemaps.values())):
+            if await self._sync(child.url, feed, on_page, stats, depth + 1):
+                feed_state.mark([child], feed)
+            else:
+                ok = False
+        return ok
+
+    async def _scrape(self, entries: List[FeedEntry], feed: str, on_page, stats: dict) -> bool:
+        """Scrape entries with a fixed number of workers, advancing watermarks in batches as pages finish."""
+        queue = list(reversed(entries))
+        done: List[FeedEntry] = []
+        failures = 0
+
+        async def work():
+            nonlocal failures
+            while queue:
+                entry = queue.pop()
+                try:
+                    page = await self.scraper.scrape_page(entry.url)
+                    if page.text is not None:
+                        if not page.has_content:
+                            raise RuntimeError("no content scraped")
+                        stats["results"][entry.url] = await on_page(page)
+                        page.commit()
+                    done.append(entry)
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"Feed entry {entry.url} failed: {e}")
+                if len(done) >= config.FEED_MARK_BATCH:
+                    feed_state.mark(done, feed)
+                    done.clear()
+
+        await asyncio.gather(*(work() for _ in range(self.workers)))
+        if done:
+            feed_state.mark(done, feed)
+        stats["failed"] += failures
+        return failures == 0
@@ -0,0 +1,117 @@
+import asyncio
+import collections
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+from urllib.parse import urlparse
+from config import config
+
+class AsyncSemaphore:
+    """Semaphore usable from coroutines running on different event loops.
+
+    Background jobs each run their own event loop, so asyncio.Semaphore (which
+    binds to one loop) cannot enforce a process-wide limit. Waiters are queued
+    FIFO and woken on their own loop via call_soon_threadsafe.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            # A slot handed over just before cancellation must be passed on;
+            # if the grant callback hasn't run yet it releases the slot itself.
+            if not queued and waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    # Waiter's loop is already closed; try the next one
+                    continue
+            self._value += 1
+
+    def _grant(self, future: asyncio.Future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+class FetchScheduler:
+    """Process-wide limiter for outgoing fetches.
+
+    Caps the total number of in-flight requests, the number of in-flight
+    requests per host, and enforces a minimum delay between request starts
+    against the same host. Callers beyond the caps wait in FIFO order.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_host: int, host_delay: float):
+        self.max_per_host = max_per_host
+        self.host_delay = host_delay
+        self._global = AsyncSemaphore(max_concurrent)
+        self._hosts: Dict[str, AsyncSemaphore] = {}
+        self._next_start: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, host: str) -> AsyncSemaphore:
+        with self._lock:
+            semaphore = self._hosts.get(host)
+            if semaphore is None:
+                semaphore = self._hosts[host] = AsyncSemaphore(self.max_per_host)
+            return semaphore
+
+    async def _wait_turn(self, host: str):
+        """Reserve the next start time for a host and sleep until it arrives."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self.host_delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Hold a fetch slot for `url` for the duration of the block."""
+        host = urlparse(url).netloc.lower()
+        # Take the host slot first so a slow host queues on itself
+        # instead of holding global slots other hosts could use.
+        async with self._host_semaphore(host):
+            await self._wait_turn(host)
+            async with self._global:
+                yield
+
+# Global scheduler instance
+fetch_scheduler = FetchScheduler(
+    config.CONCURRENT_REQUESTS,
+    config.CONCURRENT_REQUESTS_PER_HOST,
+    config.PER_HOST_DELAY,
+)
@@ -0,0 +1,138 @@
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+from loguru import logger
+from config import config
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    source TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_mtime ON files (mtime);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    file_count INTEGER NOT NULL,
+    total_size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, file_count, total_size) VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS files_insert AFTER INSERT ON files BEGIN
+    UPDATE totals SET file_count = file_count + 1, total_size = total_size + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS files_delete AFTER DELETE ON files BEGIN
+    UPDATE totals SET file_count = file_count - 1, total_size = total_size - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS files_update AFTER UPDATE OF size ON files BEGIN
+    UPDATE totals SET total_size = total_size - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+class FileIndex(SQLiteStore):
+    """Metadata index of the documents in OUTPUT_DIR.
+
+    Writers record each file as they save or delete it, so listing and
+    statistics come from SQLite instead of globbing and stat-ing the directory.
+    Running totals are kept by triggers, making the file count and total size
+    a single-row read. `reconcile` re-syncs with files changed out of band.
+    """
+
+    def __init__(self, db_path: Path, directory: Path = config.OUTPUT_DIR):
+        self.db_path = Path(db_path)
+        self.directory = Path(directory)
+        self._create(SCHEMA)
+
+    def _indexed(self, path: Path) -> bool:
+        """Only top-level .txt documents are listed (not chunks or temp files)."""
+        return path.suffix == ".txt" and path.parent.resolve() == self.directory.resolve()
+
+    def record(self, path: Path, source: Optional[str] = None):
+        """Add or refresh a file after it has been written."""
+        path = Path(path)
+        if not self._indexed(path):
+            return
+        stat = path.stat()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO files (name, source, size, mtime) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET source = COALESCE(excluded.source, source), "
+                "size = excluded.size, mtime = excluded.mtime",
+                (path.name, source, stat.st_size, stat.st_mtime),
+            )
+
+    def forget(self, path: Path):
+        """Drop a file after it has been deleted."""
+        path = Path(path)
+        if not self._indexed(path):
+            return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE name = ?", (path.name,))
+
+    def list(self, limit: int, offset: int = 0, query: Optional[str] = None,
+             since: Optional[float] = None, until: Optional[float] = None) -> Tuple[List[dict], int]:
+        """Return one page of files, newest first, and the number of files matching the filters.
+
+        `query` matches a substring of the file name or its source; `since` and
+        `until` bound the modification time (Unix seconds).
+        """
+        clauses, params = [], []
+        if query:
+            clauses.append("(name LIKE ? ESCAPE '\\' OR source LIKE ? ESCAPE '\\')")
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params += [pattern, pattern]
+        if since is not None:
+            clauses.append("mtime >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("mtime < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT name, source, size, mtime FROM files {where} ORDER BY mtime DESC, name LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+            if clauses:
+                total = conn.execute(f"SELECT COUNT(*) FROM files {where}", params).fetchone()[0]
+            else:
+                total = conn.execute("SELECT file_count FROM totals WHERE id = 0").fetchone()[0]
+        files = [{"name": name, "source": source, "size": size, "mtime": mtime} for name, source, size, mtime in rows]
+        return files, total
+
+    def stats(self) -> dict:
+        """File count, total size and the most recently modified file."""
+        with self._connect() as conn:
+            file_count, total_size = conn.execute("SELECT file_count, total_size FROM totals WHERE id = 0").fetchone()
+            latest = conn.execute("SELECT name, mtime FROM files ORDER BY mtime DESC LIMIT 1").fetchone()
+        return {"file_count": file_count, "total_size": total_size, "latest": latest}
+
+    def reconcile(self) -> Tuple[int, int]:
+        """Bring the index in line with the directory; returns (added or updated, removed)."""
+        started = time.monotonic()
+        on_disk = {}
+        for path in self.directory.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            on_disk[path.name] = (stat.st_size, stat.st_mtime)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            indexed = {name: (size, mtime) for name, size, mtime in conn.execute("SELECT name, size, mtime FROM files")}
+            changed = [(name, *meta) for name, meta in on_disk.items() if indexed.get(name) != meta]
+            # Re-checked under the write lock: a file saved since the scan is indexed, not gone
+            removed = [(name,) for name in indexed.keys() - on_disk.keys() if not (self.directory / name).exists()]
+            conn.executemany(
+                "INSERT INTO files (name, size, mtime) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET size = excluded.size, mtime = excluded.mtime",
+                changed,
+            )
+            conn.executemany("DELETE FROM files WHERE name = ?", removed)
+            conn.execute("COMMIT")
+        logger.info(f"Reconciled file index in {time.monotonic() - started:.1f}s: {len(changed)} added or updated, {len(removed)} removed")
+        return len(changed), len(removed)
+
+# Global file index instance
+file_index = FileIndex(config.FILE_INDEX_PATH)
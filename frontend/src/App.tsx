@@ -6,6 +6,8 @@ function App() {
   const [url, setUrl] = useState('');
   const [file, setFile] = useState<File | null>(null);
   const [processedFiles, setProcessedFiles] = useState<string[]>([]);
+  const [totalFiles, setTotalFiles] = useState(0);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [isScraping, setIsScraping] = useState(false);
@@ -13,16 +15,24 @@ function App() {
   const [message, setMessage] = useState<string | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
+  // The API returns one page of files at a time, with the number of all files in X-Total-Count
+  const fetchFilesPage = async (offset: number) => {
+    const response = await fetch(`${API_BASE_URL}/api/files?offset=${offset}`);
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({ error: 'Failed to fetch files' }));
+      throw new Error(errorData.error || 'Failed to fetch files');
+    }
+    const files: string[] = await response.json();
+    const total = Number(response.headers.get('X-Total-Count') ?? offset + files.length);
+    return { files, total };
+  };
+
   const fetchFiles = async () => {
     setIsLoading(true);
     try {
-      const response = await fetch(`${API_BASE_URL}/api/files`);
-      if (!response.ok) {
-        const errorData = await response.json().catch(() => ({ error: 'Failed to fetch files' }));
-        throw new Error(errorData.error || 'Failed to fetch files');
-      }
-      const data = await response.json();
-      setProcessedFiles(data);
+      const { files, total } = await fetchFilesPage(0);
+      setProcessedFiles(files);
+      setTotalFiles(total);
     } catch (err) {
       if (err instanceof Error) {
         setError(err.message);
@@ -34,6 +44,24 @@ function App() {
     }
   };
 
+  const loadMoreFiles = async () => {
+    setIsLoadingMore(true);
+    try {
+      const { files, total } = await fetchFilesPage(processedFiles.length);
+      // Files saved since the first page shift the newest-first list, so a page may repeat names
+      setProcessedFiles((current) => [...current, ...files.filter((name) => !current.includes(name))]);
+      setTotalFiles(total);
+    } catch (err) {
+      if (err instanceof Error) {
+        setError(err.message);
+      } else {
+        setError('An unknown error occurred while fetching files.');
+      }
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchFiles();
   }, []);
@@ -203,7 +231,10 @@ function App() {
       {/* Processed Files List */}
       <div className="px-4 sm:px-6 pb-4">
         <div className="bg-slate-800/50 p-6 rounded-xl shadow-xl border border-slate-700">
-          <h2 className="text-2xl font-semibold mb-4 text-sky-300">Processed Files</h2>
+          <h2 className="text-2xl font-semibold mb-4 text-sky-300">
+            Processed Files
+            {totalFiles > 0 && <span className="ml-2 text-base font-normal text-slate-400">({processedFiles.length} of {totalFiles})</span>}
+          </h2>
           {isLoading ? (
             <p className="text-slate-400">Loading files...</p>
           ) : processedFiles.length > 0 ? (
@@ -216,6 +247,13 @@ function App() {
                   </a>
                 </li>
               ))}
+              {processedFiles.length < totalFiles && (
+                <li className="text-center">
+                  <button onClick={loadMoreFiles} disabled={isLoadingMore} className="bg-slate-600 hover:bg-slate-500 disabled:opacity-50 text-white font-bold py-1 px-3 rounded-md text-sm transition duration-300 focus:outline-none focus:ring-4 focus:ring-slate-500/50">
+                    {isLoadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                </li>
+              )}
             </ul>
           ) : (
             <p className="text-slate-400">No files found. Scrape a URL or upload a PDF to get started.</p>
@@ -0,0 +1,247 @@
+import re
+from urllib.parse import urljoin
+from loguru import logger
+from bs4 import BeautifulSoup
+from config import config
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml is in requirements.txt, bs4 still works without it
+    lxml = None
+
+# Elements removed as page boilerplate
+BOILERPLATE_TAGS = ['script', 'style', 'nav', 'footer', 'header']
+# Class words that mark ads and other non-content elements
+AD_CLASS_MARKERS = ['ad', 'ads', 'adsbygoogle', 'advert', 'advertisement', 'banner', 'sponsored']
+# Markers must be whole words of a class name, so "header", "shadow" and "loading" are kept
+AD_CLASS_RE = re.compile(r"(?:^|[\s_-])(?:" + "|".join(AD_CLASS_MARKERS) + r")(?=$|[\s_-])", re.IGNORECASE)
+# Elements whose text BeautifulSoup's get_text() leaves out
+NON_TEXT_TAGS = ['template', 'rt', 'rp']
+# Link targets that never lead to another page
+NON_PAGE_SCHEMES = ('#', 'mailto:', 'javascript:', 'tel:', 'data:')
+
+def resolve_links(page_url: str, base_href: str | None, anchors) -> list[str]:
+    """Absolute URLs of (href, rel) anchor pairs, in page order, skipping nofollow and non-page links."""
+    base = urljoin(page_url, base_href.strip()) if base_href else page_url
+    links = []
+    for href, rel in anchors:
+        href = (href or '').strip()
+        if not href or href.lower().startswith(NON_PAGE_SCHEMES) or 'nofollow' in (rel or '').lower().split():
+            continue
+        links.append(urljoin(base, href))
+    return list(dict.fromkeys(links))
+
+class BS4Cleaner:
+    """Reference cleaner on BeautifulSoup's pure-Python html.parser."""
+
+    name = "bs4"
+
+    def clean(self, html: str) -> str:
+        return self._clean_soup(BeautifulSoup(html, 'html.parser'))
+
+    def clean_with_links(self, html: str, page_url: str) -> tuple[str, list[str]]:
+        """Clean a page and return the absolute URLs it links to, navigation links included."""
+        soup = BeautifulSoup(html, 'html.parser')
+        base = soup.find('base', href=True)
+        anchors = ((a['href'], ' '.join(a.get('rel') or [])) for a in soup.find_all('a', href=True))
+        links = resolve_links(page_url, base['href'] if base else None, anchors)
+        return self._clean_soup(soup), links
+
+    def _clean_soup(self, soup) -> str:
+        # Remove common boilerplate elements
+        for elem in soup(BOILERPLATE_TAGS):
+            elem.decompose()
+
+        # Remove ads and other non-content elements
+        for elem in soup.find_all(class_=lambda x: x and AD_CLASS_RE.search(x)):
+            elem.decompose()
+
+        # Get text content
+        return soup.get_text(separator='\n', strip=True)
+
+# Class/id words that suggest a block is or is not the main content
+POSITIVE_RE = re.compile(r"article|body|content|entry|main|page|post|story|text", re.IGNORECASE)
+NEGATIVE_RE = re.compile(
+    r"comment|sidebar|aside|related|share|social|promo|widget|menu|breadcrumb|footer|masthead|meta|"
+    r"outbrain|taboola|popup|newsletter|subscribe|cookie|pagination|tags?\b",
+    re.IGNORECASE,
+)
+# Elements whose text counts as a paragraph when scoring parents
+PARAGRAPH_TAGS = {'p', 'pre', 'td', 'blockquote'}
+# Children that stop a <div> from being scored as a paragraph itself
+BLOCK_TAGS = {'a', 'blockquote', 'dl', 'div', 'img', 'ol', 'p', 'pre', 'table', 'ul', 'section', 'article'}
+MIN_PARAGRAPH_CHARS = 25
+# Below this much extracted text the page is not article-like and is returned whole
+MIN_CONTENT_CHARS = 250
+
+def _text_lines(elem) -> list[str]:
+    lines = (text.strip() for text in elem.itertext())
+    return [line for line in lines if line]
+
+class MainContentExtractor:
+    """Readability-style scoring of DOM blocks to find the main article.
+
+    Paragraph-like blocks add a score based on their length and comma count to
+    their parent (and half to their grandparent). Candidates are weighted by
+    class/id hints and scaled down by link density; the best candidate is kept
+    along with siblings that score close to it.
+    """
+
+    def _class_weight(self, elem) -> int:
+        hints = f"{elem.get('class', '')} {elem.get('id', '')}"
+        weight = 0
+        if NEGATIVE_RE.search(hints):
+            weight -= 25
+        if POSITIVE_RE.search(hints):
+            weight += 25
+        return weight
+
+    def _link_density(self, elem, text_length: int) -> float:
+        if not text_length:
+            return 1.0
+        link_length = sum(len(link.text_content().strip()) for link in elem.iter('a'))
+        return link_length / text_length
+
+    def _is_paragraph(self, elem) -> bool:
+        if elem.tag in PARAGRAPH_TAGS:
+            return True
+        return elem.tag == 'div' and not any(child.tag in BLOCK_TAGS for child in elem)
+
+    def _drop_unlikely(self, root):
+        page_length = len(root.text_content())
+        for elem in list(root.iter('aside', 'form', 'div', 'section', 'ul')):
+            hints = f"{elem.get('class', '')} {elem.get('id', '')}"
+            if elem.getparent() is None or not NEGATIVE_RE.search(hints) or POSITIVE_RE.search(hints):
+                continue
+            # A wrapper holding most of the page (e.g. class="has-sidebar") is layout, not noise
+            if len(elem.text_content()) * 2 < page_length:
+                elem.drop_tree()
+
+    def extract(self, root) -> list[str] | None:
+        """Return the text lines of the main content, or None if no article-like block was found.
+
+        Modifies `root`: unlikely blocks are removed before scoring.
+        """
+        self._drop_unlikely(root)
+        scores = {}
+        for elem in root.iter():
+            if not isinstance(elem.tag, str) or not self._is_paragraph(elem):
+                continue
+            text = elem.text_content().strip()
+            if len(text) < MIN_PARAGRAPH_CHARS:
+                continue
+            score = 1 + text.count(',') + min(len(text) // 100, 3)
+            parent = elem.getparent()
+            for ancestor, share in ((parent, 1.0), (parent.getparent() if parent is not None else None, 0.5)):
+                if ancestor is None or not isinstance(ancestor.tag, str):
+                    continue
+                if ancestor not in scores:
+                    scores[ancestor] = self._class_weight(ancestor) + (5 if ancestor.tag in ('div', 'article', 'main') else 0)
+                scores[ancestor] += score * share
+        if not scores:
+            return None
+
+        lengths = {}
+        for elem in scores:
+            lengths[elem] = len(elem.text_content().strip())
+            scores[elem] *= 1 - self._link_density(elem, lengths[elem])
+        top = max(scores, key=scores.get)
+        if lengths[top] < MIN_CONTENT_CHARS:
+            return None
+
+        parent = top.getparent()
+        siblings = [top] if parent is None else list(parent)
+        threshold = max(10, scores[top] * 0.2)
+        lines = []
+        for sibling in siblings:
+            if not isinstance(sibling.tag, str):
+                continue
+            keep = sibling is top or scores.get(sibling, 0) >= threshold
+            if not keep and sibling.tag == 'p':
+                text = sibling.text_content().strip()
+                density = self._link_density(sibling, len(text))
+                keep = (len(text) > 80 and density < 0.25) or (0 < len(text) <= 80 and density == 0 and re.search(r"\.( |$)", text))
+            if keep:
+                lines.extend(_text_lines(sibling))
+        return lines
+
+class LxmlCleaner:
+    """Cleaner on libxml2's C HTML parser, producing the same text as BS4Cleaner.
+
+    Boilerplate and ad matching run as compiled XPath instead of a Python
+    callback per element, and text is collected in one pass over the tree. With
+    `main_content` set, only the main article found by MainContentExtractor
+    is kept instead of all of the page's text.
+    """
+
+    name = "lxml"
+
+    def __init__(self, main_content: bool = False):
+        self._removable = etree.XPath(" | ".join(f"//{tag}" for tag in BOILERPLATE_TAGS))
+        # Substring match in XPath narrows the candidates; AD_CLASS_RE then checks word boundaries.
+        # translate() lower-cases just the letters the markers are made of.
+        letters = "".join(sorted(set("".join(AD_CLASS_MARKERS))))
+        lowered = f"translate(@class, '{letters.upper()}', '{letters}')"
+        substrings = [m for m in AD_CLASS_MARKERS if not any(o != m and o in m for o in AD_CLASS_MARKERS)]
+        self._ad_candidates = etree.XPath("//*[" + " or ".join(f"contains({lowered}, '{m}')" for m in substrings) + "]")
+        self._non_text = etree.XPath(" | ".join(f"//{tag}" for tag in NON_TEXT_TAGS))
+        self._anchors = etree.XPath("//a[@href]")
+        self._base_href = etree.XPath("string(//base/@href)")
+        self.extractor = MainContentExtractor() if main_content else None
+
+    def clean(self, html: str) -> str:
+        if not html.strip():
+            return ""
+        root = self._parse(html)
+        if root is None:
+            return BS4Cleaner().clean(html)
+        return self._clean_tree(root)
+
+    def clean_with_links(self, html: str, page_url: str) -> tuple[str, list[str]]:
+        """Clean a page and return the absolute URLs it links to, navigation links included."""
+        if not html.strip():
+            return "", []
+        root = self._parse(html)
+        if root is None:
+            return BS4Cleaner().clean_with_links(html, page_url)
+        # Collected before boilerplate removal: nav and footer links are how a site is crawled
+        links = resolve_links(
+            page_url, self._base_href(root) or None, ((a.get('href'), a.get('rel')) for a in self._anchors(root))
+        )
+        return self._clean_tree(root), links
+
+    def _parse(self, html: str):
+        try:
+            return lxml.html.document_fromstring(html)
+        except (etree.ParserError, ValueError) as e:
+            # e.g. XHTML strings with an encoding declaration
+            logger.debug(f"lxml could not parse document ({e}); falling back to bs4")
+            return None
+
+    def _clean_tree(self, root) -> str:
+        for elem in self._removable(root):
+            elem.drop_tree()
+        for elem in self._ad_candidates(root):
+            if elem.getparent() is not None and AD_CLASS_RE.search(elem.get('class')):
+                elem.drop_tree()
+        for elem in self._non_text(root):
+            elem.clear(keep_tail=True)
+
+        if self.extractor:
+            lines = self.extractor.extract(root)
+            if lines:
+                return "\n".join(lines)
+        return "\n".join(_text_lines(root))
+
+def get_cleaner(backend: str = config.HTML_PARSER, main_content: bool = config.HTML_MAIN_CONTENT):
+    """Return the HTML cleaner for `backend`, falling back to bs4 if lxml is unavailable."""
+    if backend == "lxml":
+        if lxml is not None:
+            return LxmlCleaner(main_content)
+        logger.warning("lxml is not installed; falling back to the bs4 HTML cleaner")
+    elif backend != "bs4":
+        raise ValueError(f"Unknown HTML parser backend '{backend}'")
+    if main_content:
+        logger.warning("Main-content extraction needs the lxml backend; the bs4 cleaner keeps the full page text")
+    return BS4Cleaner()
@@ -0,0 +1,62 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+from config import config
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+@dataclass
+class CacheEntry:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: str
+
+class HTTPCache(SQLiteStore):
+    """On-disk store of HTTP validators (ETag, Last-Modified) and body hashes per URL.
+
+    Only validators are kept, not bodies: an unchanged page never needs to be
+    re-parsed or re-ingested, so there is nothing to replay from the cache.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._create(SCHEMA)
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT url, etag, last_modified, body_hash FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Request headers that let the server answer 304 Not Modified."""
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, entry: CacheEntry):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO http_cache (url, etag, last_modified, body_hash, fetched_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified, "
+                "body_hash = excluded.body_hash, fetched_at = excluded.fetched_at",
+                (entry.url, entry.etag, entry.last_modified, entry.body_hash, time.time()),
+            )
+
+# Global HTTP cache instance
+http_cache = HTTPCache(config.HTTP_CACHE_PATH)
@@ -0,0 +1,141 @@
+import asyncio
+import codecs
+import hashlib
+import re
+import threading
+import weakref
+import aiohttp
+from pathlib import Path
+from loguru import logger
+from config import config
+
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.IGNORECASE)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+class SessionManager:
+    """Process-wide owner of long-lived aiohttp sessions.
+
+    aiohttp sessions are bound to the event loop they were created on, so one
+    pooled session is kept per running loop and reused by every scrape on it.
+    """
+
+    def __init__(self, headers: dict | None = None):
+        self.headers = headers or DEFAULT_HEADERS
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_POOL_SIZE,
+            limit_per_host=config.HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True,
+        )
+        timeout = aiohttp.ClientTimeout(total=config.REQUEST_TIMEOUT)
+        return aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session for the current event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                session = self._create_session()
+                self._sessions[loop] = session
+                logger.debug(f"Created pooled HTTP session for loop {id(loop)}")
+            return session
+
+    async def close(self):
+        """Close the session bound to the current event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+        if session and not session.closed:
+            await session.close()
+            logger.debug(f"Closed pooled HTTP session for loop {id(loop)}")
+
+# Read timeout for bodies that legitimately take longer than REQUEST_TIMEOUT in total (large PDFs and sitemaps);
+# only a connect or a read that stalls for REQUEST_TIMEOUT fails the request
+STREAMING_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=config.REQUEST_TIMEOUT, sock_read=config.REQUEST_TIMEOUT)
+SIGNATURE_WINDOW = 1024  # Leading bytes searched for a file signature
+
+class DownloadRejected(Exception):
+    """A response was refused by its headers or grew past the size limit; retrying won't help."""
+
+def media_type(headers) -> str:
+    """The bare, lower-cased media type of a Content-Type header ("" if absent)."""
+    return headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+def check_response_headers(url: str, headers, allowed_types: list[str], max_bytes: int):
+    """Reject a response from its headers alone, before any of the body is read.
+
+    A missing Content-Type is let through; the size limit still applies while reading.
+    """
+    content_type = media_type(headers)
+    if content_type and content_type not in allowed_types:
+        raise DownloadRejected(f"{url} has unsupported content type '{content_type}'")
+    length = headers.get('Content-Length')
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise DownloadRejected(f"{url} is {int(length)} bytes, over the {max_bytes} byte limit")
+
+async def read_limited(url: str, response: aiohttp.ClientResponse, max_bytes: int) -> bytes:
+    """Stream a response body, aborting as soon as it grows past `max_bytes`.
+
+    The length is checked after decompression, so a small gzipped body can't
+    expand past the limit either.
+    """
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(config.DOWNLOAD_CHUNK_SIZE):
+        body += chunk
+        if len(body) > max_bytes:
+            raise DownloadRejected(f"{url} exceeded the {max_bytes} byte limit while downloading")
+    return bytes(body)
+
+async def stream_to_file(url: str, response: aiohttp.ClientResponse, path: Path, max_bytes: int,
+                         signature: bytes | None = None) -> str:
+    """Stream a response body to `path` under the same size limit, returning its sha256.
+
+    With `signature`, the download is rejected as soon as its first
+    SIGNATURE_WINDOW bytes turn out not to contain it, before the rest is read.
+    The partial file is removed if the download fails or is aborted.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    try:
+        with open(path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(config.DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise DownloadRejected(f"{url} exceeded the {max_bytes} byte limit while downloading")
+                if signature and len(head) < SIGNATURE_WINDOW:
+                    head += chunk[:SIGNATURE_WINDOW - len(head)]
+                    if len(head) == SIGNATURE_WINDOW and signature not in head:
+                        raise DownloadRejected(f"{url} does not start with the expected {signature!r} signature")
+                digest.update(chunk)
+                f.write(chunk)
+        if signature and signature not in head:
+            raise DownloadRejected(f"{url} does not start with the expected {signature!r} signature")
+    except BaseException:
+        Path(path).unlink(missing_ok=True)
+        raise
+    return digest.hexdigest()
+
+def decode_body(response: aiohttp.ClientResponse, body: bytes) -> str:
+    """Decode a body read with read_limited: header charset, then <meta charset>, then UTF-8."""
+    encoding = response.charset
+    if not encoding:
+        match = META_CHARSET_RE.search(body[:4096])
+        encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = 'utf-8'
+    return body.decode(encoding, errors='replace')
+
+# Global session manager instance
+session_manager = SessionManager()
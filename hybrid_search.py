@@ -0,0 +1,74 @@
+from typing import Dict, List, Optional
+from loguru import logger
+from config import config
+from bm25_index import bm25_index
+from chunker import document_name
+from embedding_engine import embedding_engine
+from vector_index import vector_index
+
+SEARCH_MODES = ("hybrid", "vector", "keyword")
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[str]], k: int = config.RRF_K) -> List[tuple]:
+    """Fuse ranked lists of document names: each list adds 1 / (k + rank) to a document's score.
+
+    Returns (name, score, {ranker: rank}) tuples, best first. Only ranks are
+    used, so BM25 and cosine scores never need to be put on a common scale.
+    """
+    fused: Dict[str, list] = {}
+    for ranker, names in rankings.items():
+        for rank, name in enumerate(names, start=1):
+            entry = fused.setdefault(name, [0.0, {}])
+            entry[0] += 1.0 / (k + rank)
+            entry[1][ranker] = rank
+    return sorted(((name, score, ranks) for name, (score, ranks) in fused.items()), key=lambda item: -item[1])
+
+def _vector_candidates(query: str, limit: int, approximate: Optional[bool]) -> Dict[str, dict]:
+    """Best-matching chunk per document from the vector index, keyed by document name in rank order."""
+    documents = {}
+    # Chunks outnumber documents; over-fetch so `limit` distinct documents usually remain
+    for hit in vector_index.search(embedding_engine.embed_query(query), limit * 4, approximate=approximate):
+        name = document_name(hit["source"])
+        if name not in documents:
+            documents[name] = {"chunk": hit["source"], "snippet": hit["snippet"], "vector_score": hit["score"]}
+            if len(documents) == limit:
+                break
+    return documents
+
+def hybrid_search(query: str, top_k: int = config.SEARCH_TOP_K, mode: str = "hybrid",
+                  approximate: Optional[bool] = None) -> List[dict]:
+    """Search processed documents by keywords (BM25), meaning (embeddings), or both fused by rank.
+
+    In hybrid mode the vector side is skipped, with a warning, when nothing has
+    been embedded locally or the embedding model is unavailable.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'")
+    candidates = max(top_k, config.SEARCH_CANDIDATES)
+    rankings, details = {}, {}
+
+    if mode in ("hybrid", "keyword"):
+        hits = bm25_index.search(query, candidates)
+        rankings["keyword"] = [hit["name"] for hit in hits]
+        for hit in hits:
+            details.setdefault(hit["name"], {})["bm25_score"] = hit["score"]
+
+    if mode == "vector" or (mode == "hybrid" and len(vector_index)):
+        try:
+            documents = _vector_candidates(query, candidates, approximate)
+        except RuntimeError as e:
+            if mode == "vector":
+                raise
+            logger.warning(f"Vector search unavailable, returning keyword results only: {e}")
+        else:
+            rankings["vector"] = list(documents)
+            for name, hit in documents.items():
+                details.setdefault(name, {}).update(hit)
+
+    results = []
+    for name, score, ranks in reciprocal_rank_fusion(rankings)[:top_k]:
+        result = {"name": name, "score": round(score, 6), "ranks": ranks, **details.get(name, {})}
+        if "snippet" not in result:
+            # Keyword-only hits: excerpt the document around the first query term
+            result["snippet"] = bm25_index.snippet(name, query)
+        results.append(result)
+    return results
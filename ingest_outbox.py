@@ -0,0 +1,108 @@
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+from config import config
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    file_path TEXT NOT NULL,
+    collection_name TEXT NOT NULL,
+    doc_id TEXT,
+    step TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (file_path, collection_name)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (next_attempt_at);
+"""
+
+def jittered_backoff(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: a random delay up to min(cap, base * 2**attempt)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+@dataclass
+class OutboxRecord:
+    file_path: str
+    collection_name: str
+    doc_id: Optional[str]
+    step: str
+    attempts: int
+
+class IngestOutbox(SQLiteStore):
+    """On-disk outbox of documents whose ingestion into Open WebUI failed part-way.
+
+    Each record remembers the step to resume from: "upload" when the file never
+    reached Open WebUI, or "add" with the uploaded doc_id, so a document that
+    was uploaded but not added to its collection is never orphaned or re-uploaded.
+    """
+
+    def __init__(self, db_path: Path, max_attempts: int = config.OUTBOX_MAX_ATTEMPTS):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self._create(SCHEMA)
+
+    def put(self, file_path: Path, collection_name: str, doc_id: Optional[str], error: str) -> int:
+        """Record a failed attempt and schedule the next one; returns the attempt count."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, doc_id FROM outbox WHERE file_path = ? AND collection_name = ?",
+                (str(file_path), collection_name),
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            # Keep a known doc_id even if a later attempt failed before reaching it
+            doc_id = doc_id or (row[1] if row else None)
+            delay = jittered_backoff(attempts, config.OUTBOX_RETRY_BASE, config.OUTBOX_RETRY_MAX)
+            conn.execute(
+                "INSERT INTO outbox (file_path, collection_name, doc_id, step, attempts, last_error, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(file_path, collection_name) DO UPDATE SET doc_id = excluded.doc_id, step = excluded.step, "
+                "attempts = excluded.attempts, last_error = excluded.last_error, next_attempt_at = excluded.next_attempt_at",
+                (str(file_path), collection_name, doc_id, "add" if doc_id else "upload", attempts, error, now + delay, now),
+            )
+            conn.execute("COMMIT")
+        return attempts
+
+    def get(self, file_path: Path, collection_name: str) -> Optional[OutboxRecord]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_path, collection_name, doc_id, step, attempts FROM outbox WHERE file_path = ? AND collection_name = ?",
+                (str(file_path), collection_name),
+            ).fetchone()
+        return OutboxRecord(*row) if row else None
+
+    def contains(self, file_path: Path, collection_name: str) -> bool:
+        """Whether the document is parked and still due to be retried."""
+        record = self.get(file_path, collection_name)
+        return record is not None and record.attempts < self.max_attempts
+
+    def remove(self, file_path: Path, collection_name: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM outbox WHERE file_path = ? AND collection_name = ?", (str(file_path), collection_name))
+
+    def due(self, limit: int) -> List[OutboxRecord]:
+        """Records whose next attempt is due, oldest first, skipping exhausted ones."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT file_path, collection_name, doc_id, step, attempts FROM outbox "
+                "WHERE next_attempt_at <= ? AND attempts < ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), self.max_attempts, limit),
+            ).fetchall()
+        return [OutboxRecord(*row) for row in rows]
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the next retryable record is due, or None if there are none."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE attempts < ?", (self.max_attempts,)
+            ).fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0.0)
+
+# Global ingestion outbox instance
+ingest_outbox = IngestOutbox(config.OUTBOX_PATH)
@@ -0,0 +1,211 @@
+import asyncio
+import inspect
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+from config import config
+from sqlite_store import SQLiteStore
+from http_session import session_manager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+class JobQueue(SQLiteStore):
+    """Durable SQLite-backed job queue served by a fixed pool of worker threads.
+
+    Each worker owns one long-lived event loop, so coroutine handlers reuse the
+    pooled HTTP session of that loop across jobs. Jobs left in the 'running'
+    state by a crashed process are re-queued when the queue starts.
+    """
+
+    row_factory = sqlite3.Row
+
+    def __init__(self, db_path: Path, workers: int):
+        self.db_path = Path(db_path)
+        self.workers = workers
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._threads: list[threading.Thread] = []
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._create(SCHEMA)
+
+    def register(self, kind: str, handler: Callable[..., Any]):
+        """Register a handler called with the job payload as keyword arguments."""
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Persist a new job and wake a worker. Returns the job ID."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job_id = str(uuid.uuid4())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, kind, json.dumps(payload), time.time()),
+            )
+        logger.info(f"Queued {kind} job {job_id}")
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the public status record of a job, or None if unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def recover(self):
+        """Re-queue jobs interrupted by a previous shutdown, failing those out of attempts."""
+        with self._connect() as conn:
+            failed = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted too many times', finished_at = ? "
+                "WHERE status = 'running' AND attempts >= ?",
+                (time.time(), config.JOB_MAX_ATTEMPTS),
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+        if requeued or failed:
+            logger.warning(f"Recovered {requeued} interrupted jobs ({failed} marked failed)")
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                        (time.time(), row["id"]),
+                    )
+                conn.execute("COMMIT")
+                return row
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _backoff(self, failures: int):
+        """Wait after the job database failed, doubling up to JOB_DB_BACKOFF_MAX; returns early on stop."""
+        self._stopping.wait(min(config.JOB_POLL_INTERVAL * 2 ** failures, config.JOB_DB_BACKOFF_MAX))
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: str | None = None):
+        """Record a job's outcome, retrying while the database is locked.
+
+        If the worker is stopped first, the job stays 'running' and is re-queued
+        by recovery on the next start.
+        """
+        failures = 0
+        while True:
+            try:
+                self._set_status(job_id, status, result, error)
+                return
+            except sqlite3.OperationalError as e:
+                logger.error(f"Could not record {status} for job {job_id}: {e}")
+                if self._stopping.is_set():
+                    return
+                self._backoff(failures)
+                failures += 1
+
+    def _set_status(self, job_id: str, status: str, result: Any, error: str | None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def _run(self, loop: asyncio.AbstractEventLoop, row: sqlite3.Row):
+        job_id, kind = row["id"], row["kind"]
+        handler = self._handlers.get(kind)
+        if handler is None:
+            self._finish(job_id, "failed", error=f"No handler registered for job kind '{kind}'")
+            return
+        logger.info(f"Worker {threading.current_thread().name} running {kind} job {job_id}")
+        try:
+            outcome = handler(**json.loads(row["payload"]))
+            if inspect.isawaitable(outcome):
+                outcome = loop.run_until_complete(outcome)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed: {e}")
+            self._finish(job_id, "failed", error=str(e))
+            return
+        self._finish(job_id, "done", result=outcome)
+        logger.info(f"Job {job_id} finished")
+
+    def _worker(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        failures = 0
+        try:
+            while not self._stopping.is_set():
+                try:
+                    row = self._claim()
+                except sqlite3.OperationalError as e:
+                    # e.g. "database is locked" past the busy timeout; losing the thread would shrink the pool
+                    logger.error(f"Worker {threading.current_thread().name} could not claim a job: {e}")
+                    self._backoff(failures)
+                    failures += 1
+                    continue
+                failures = 0
+                if row is None:
+                    with self._wakeup:
+                        self._wakeup.wait(timeout=config.JOB_POLL_INTERVAL)
+                    continue
+                self._run(loop, row)
+        finally:
+            loop.run_until_complete(session_manager.close())
+            loop.close()
+
+    def start(self):
+        """Recover interrupted jobs and start the worker pool."""
+        if self._threads:
+            return
+        self.recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} job workers")
+
+    def stop(self, timeout: float | None = None):
+        """Signal workers to exit after their current job and wait for them."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+# Global job queue instance
+job_queue = JobQueue(config.JOB_DB_PATH, config.JOB_WORKERS)
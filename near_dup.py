@@ -0,0 +1,181 @@
+import hashlib
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+import numpy as np
+from config import config
+from sqlite_store import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_signatures_source ON signatures (source);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bands_bucket ON bands (band, bucket);
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT NOT NULL,
+    canonical_path TEXT NOT NULL,
+    similarity REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+WORD_RE = re.compile(r"\w+")
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+BLOCK_SIZE = 8192  # Shingles hashed per vectorized step
+
+def _words(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        yield from WORD_RE.findall(line.lower())
+
+class MinHasher:
+    """Computes MinHash signatures over word shingles, streaming through the text."""
+
+    def __init__(self, num_perm: int = config.NEAR_DUP_NUM_PERM, shingle_size: int = config.NEAR_DUP_SHINGLE_SIZE, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # Coefficients stay below 2**32 so a * x never overflows 64 bits for 32-bit shingle hashes
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def _shingle_hashes(self, lines: Iterable[str]) -> Iterator[np.ndarray]:
+        window = deque(maxlen=self.shingle_size)
+        block = []
+        for word in _words(lines):
+            window.append(word)
+            if len(window) == self.shingle_size:
+                block.append(zlib.crc32(" ".join(window).encode('utf-8')))
+                if len(block) == BLOCK_SIZE:
+                    yield np.array(block, dtype=np.uint64)
+                    block = []
+        if not block and len(window) and len(window) < self.shingle_size:
+            # Documents shorter than one shingle are hashed as a whole
+            block.append(zlib.crc32(" ".join(window).encode('utf-8')))
+        if block:
+            yield np.array(block, dtype=np.uint64)
+
+    def signature(self, lines: Iterable[str]) -> Optional[np.ndarray]:
+        """MinHash signature of the text, or None if it has no words."""
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        empty = True
+        for hashes in self._shingle_hashes(lines):
+            permuted = ((self.a[:, None] * hashes[None, :]) % MERSENNE_PRIME + self.b[:, None]) % MERSENNE_PRIME
+            np.minimum(signature, (permuted & MAX_HASH).min(axis=1), out=signature)
+            empty = False
+        return None if empty else signature
+
+class NearDuplicateIndex(SQLiteStore):
+    """On-disk MinHash LSH index of ingested documents.
+
+    Signatures are split into NEAR_DUP_BANDS bands; documents sharing any band
+    bucket are candidates, confirmed by the Jaccard similarity estimated from
+    their full signatures. Documents are added incrementally as they are saved.
+    """
+
+    def __init__(self, db_path: Path, threshold: float = config.NEAR_DUP_THRESHOLD, bands: int = config.NEAR_DUP_BANDS):
+        self.db_path = Path(db_path)
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("NEAR_DUP_NUM_PERM must be a multiple of NEAR_DUP_BANDS")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        # Serializes check-then-add so concurrent saves of the same article can't both pass
+        self.lock = threading.Lock()
+        self._create(SCHEMA)
+
+    def _buckets(self, signature: np.ndarray) -> list[Tuple[int, int]]:
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            bucket = int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'big', signed=True)
+            buckets.append((band, bucket))
+        return buckets
+
+    def find(self, signature: np.ndarray, exclude_source: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Return (path, similarity) of the most similar indexed document above the threshold.
+
+        Documents from `exclude_source` are ignored: an earlier version of the
+        same page is what an edit replaces, not a copy of it.
+        """
+        buckets = self._buckets(signature)
+        with self._connect() as conn:
+            clause = " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+            params = [value for pair in buckets for value in pair]
+            rows = conn.execute(
+                f"SELECT id, path, source, signature FROM signatures WHERE id IN (SELECT doc_id FROM bands WHERE {clause})",
+                params,
+            ).fetchall()
+        best = None
+        for _, path, source, blob in rows:
+            if source == exclude_source:
+                continue
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint64) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (path, similarity)
+        return best
+
+    def add(self, path: Path, source: str, signature: np.ndarray):
+        """Index a document's signature, replacing the signature of an earlier version from the same source."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM bands WHERE doc_id IN (SELECT id FROM signatures WHERE source = ?)", (source,))
+            conn.execute("DELETE FROM signatures WHERE source = ?", (source,))
+            doc_id = conn.execute(
+                "INSERT INTO signatures (path, source, signature) VALUES (?, ?, ?)",
+                (str(path), source, signature.tobytes()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO bands (band, bucket, doc_id) VALUES (?, ?, ?)",
+                [(band, bucket, doc_id) for band, bucket in self._buckets(signature)],
+            )
+            conn.execute("COMMIT")
+
+    def link(self, source: str, canonical_path: str, similarity: float):
+        """Record that `source` is a near-duplicate of an already ingested document."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO links (source, canonical_path, similarity, created_at) VALUES (?, ?, ?, ?)",
+                (source, canonical_path, similarity, time.time()),
+            )
+
+    def check_and_add(self, source: str, path: Path, lines: Iterable[str]) -> Optional[Tuple[str, float]]:
+        """Index a new document unless it near-duplicates one already indexed.
+
+        Returns (canonical_path, similarity) for a near-duplicate, which is linked
+        to its canonical document instead of being indexed; otherwise None. A
+        new version of an already indexed source replaces the old signature.
+        """
+        signature = self.hasher.signature(lines)
+        if signature is None:
+            return None
+        with self.lock:
+            match = self.find(signature, exclude_source=source)
+            if match:
+                self.link(source, *match)
+                return match
+            self.add(path, source, signature)
+        return None
+
+    def forget_path(self, path: Path):
+        """Drop a deleted file from the index."""
+        with self.lock, self._connect() as conn:
+            conn.execute("DELETE FROM bands WHERE doc_id IN (SELECT id FROM signatures WHERE path = ?)", (str(path),))
+            conn.execute("DELETE FROM signatures WHERE path = ?", (str(path),))
+
+# Global near-duplicate index instance
+near_dup_index = NearDuplicateIndex(config.NEAR_DUP_INDEX_PATH)
@@ -0,0 +1,75 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from loguru import logger
+from config import config
+from fetch_scheduler import AsyncSemaphore
+from html_cleaner import get_cleaner
+
+_local = threading.local()
+
+def _worker_cleaner(backend: str):
+    cleaner = getattr(_local, "cleaner", None)
+    if cleaner is None or cleaner.name != backend:
+        cleaner = _local.cleaner = get_cleaner(backend)
+    return cleaner
+
+def _clean_html(html: str, backend: str) -> str:
+    """Runs in a pool worker: clean a page with a per-worker cleaner instance."""
+    return _worker_cleaner(backend).clean(html)
+
+def _clean_html_with_links(html: str, backend: str, page_url: str) -> tuple[str, list[str]]:
+    """Runs in a pool worker: clean a page and collect its links from the same parse."""
+    return _worker_cleaner(backend).clean_with_links(html, page_url)
+
+class ParsePool:
+    """Worker pool that takes CPU-heavy HTML cleaning off the event loop.
+
+    A process pool sidesteps the GIL; a thread pool avoids pickling pages and
+    is enough when lxml does most of the work in C. `backlog` bounds how many
+    pages may be fetched but not yet parsed, across all event loops, so slow
+    parsing throttles fetching instead of piling page bodies up in memory.
+    """
+
+    def __init__(self, kind: str, workers: int, backlog: int):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown HTML parse executor '{kind}'")
+        self.kind = kind
+        self.workers = workers
+        self.backlog = AsyncSemaphore(backlog)
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # Spawn rather than fork: the API process is multi-threaded
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="html-parse")
+                logger.info(f"Started HTML parse {self.kind} pool with {self.workers} workers")
+            return self._executor
+
+    async def clean(self, html: str, backend: str = config.HTML_PARSER) -> str:
+        """Clean a page in the pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), _clean_html, html, backend)
+
+    async def clean_with_links(self, html: str, page_url: str, backend: str = config.HTML_PARSER) -> tuple[str, list[str]]:
+        """Clean a page in the pool and return its text with the absolute URLs it links to."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), _clean_html_with_links, html, backend, page_url)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+# Global HTML parse pool instance
+parse_pool = ParsePool(config.HTML_PARSE_EXECUTOR, config.HTML_PARSE_WORKERS, config.HTML_PARSE_BACKLOG)
@@ -0,0 +1,179 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import shutil
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from pdfminer.high_level import extract_text, extract_text_to_fp
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+from loguru import logger
+from config import config
+
+class PDFExtractionTimeout(Exception):
+    """Raised when a document takes longer than PDF_TIMEOUT to extract."""
+
+@contextmanager
+def _time_limit(timeout: float, pdf_path: str):
+    """Raise PDFExtractionTimeout in this process if the block runs past `timeout`."""
+    def _raise_timeout(signum, frame):
+        raise PDFExtractionTimeout(f"PDF extraction of {pdf_path} exceeded {timeout}s")
+
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _extract_text(pdf_path: str, timeout: float) -> str:
+    """Runs in a pool process: extract a document's text under a wall-clock alarm."""
+    with _time_limit(timeout, pdf_path):
+        return extract_text(pdf_path, maxpages=config.PDF_MAX_PAGES)
+
+def _count_pages(pdf_path: str, timeout: float) -> int:
+    """Runs in a pool process: read the page count from the document's page tree."""
+    with _time_limit(timeout, pdf_path), open(pdf_path, 'rb') as f:
+        document = PDFDocument(PDFParser(f))
+        try:
+            return int(resolve1(document.catalog['Pages'])['Count'])
+        except Exception:
+            # Malformed page tree; fall back to walking it
+            return sum(1 for _ in PDFPage.create_pages(document))
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, part_path: str, timeout: float) -> str:
+    """Runs in a pool process: stream the text of pages [start, stop) to `part_path` page by page."""
+    with _time_limit(timeout, pdf_path), open(pdf_path, 'rb') as inf, open(part_path, 'wb') as outf:
+        extract_text_to_fp(
+            inf, outf,
+            laparams=LAParams(),
+            page_numbers=range(start, stop),
+            maxpages=stop,
+            codec='utf-8',
+        )
+    return part_path
+
+class PDFPool:
+    """Process pool for CPU-bound PDF text extraction.
+
+    pdfminer is pure Python, so extraction runs in separate processes to keep it
+    off the GIL of the API and scraper threads. Each document is bounded by a
+    per-document timeout enforced inside the worker process.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork: the API process is multi-threaded
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(f"Started PDF process pool with {self.workers} workers")
+            return self._executor
+
+    def _discard_if_broken(self):
+        """Drop an executor whose worker died so the next submission starts a fresh one."""
+        with self._lock:
+            executor = self._executor
+            if executor is None or not getattr(executor, "_broken", False):
+                return
+            self._executor = None
+        logger.warning("PDF process pool was broken; restarting it")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, pdf_path: str) -> Future:
+        """Schedule extraction of one document and return its future."""
+        self._discard_if_broken()
+        return self._get_executor().submit(_extract_text, str(pdf_path), self.timeout)
+
+    def extract_text(self, pdf_path: str) -> str:
+        """Extract a document's text in the pool, blocking until it is done."""
+        future = self.submit(pdf_path)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._discard_if_broken()
+            raise
+
+    async def extract_text_async(self, pdf_path: str) -> str:
+        """Extract a document's text in the pool without blocking the event loop."""
+        future = self.submit(pdf_path)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._discard_if_broken()
+            raise
+
+    def _page_ranges(self, page_count: int) -> list[tuple[int, int]]:
+        """Split pages into one range per worker, but no smaller than PDF_MIN_PAGES_PER_TASK."""
+        size = max(math.ceil(page_count / self.workers), config.PDF_MIN_PAGES_PER_TASK)
+        return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+    def extract_to_file(self, pdf_path: str, output_path: Path) -> int:
+        """Extract up to PDF_MAX_PAGES pages into `output_path`, split across the pool.
+
+        Page ranges are extracted in parallel, each streamed page by page to its
+        own part file, and parts are appended to the output in page order as they
+        complete, so memory stays bounded by a single page. Returns the number of
+        pages extracted.
+        """
+        self._discard_if_broken()
+        executor = self._get_executor()
+        deadline = time.monotonic() + self.timeout
+        output_path = Path(output_path)
+        futures = []
+        try:
+            page_count = executor.submit(_count_pages, str(pdf_path), self.timeout).result(timeout=self.timeout)
+            if page_count > config.PDF_MAX_PAGES:
+                logger.warning(f"{pdf_path} has {page_count} pages; extracting the first {config.PDF_MAX_PAGES}")
+                page_count = config.PDF_MAX_PAGES
+
+            for start, stop in self._page_ranges(page_count):
+                part_path = output_path.with_name(f".{output_path.name}.{uuid.uuid4().hex}.part")
+                futures.append(executor.submit(_extract_page_range, str(pdf_path), start, stop, str(part_path), self.timeout))
+
+            with open(output_path, 'wb') as out:
+                for future in futures:
+                    part_path = future.result(timeout=max(deadline - time.monotonic(), 0))
+                    with open(part_path, 'rb') as part:
+                        shutil.copyfileobj(part, out)
+                    os.remove(part_path)
+            return page_count
+        except FutureTimeoutError:
+            raise PDFExtractionTimeout(f"PDF extraction of {pdf_path} exceeded {self.timeout}s")
+        except BrokenProcessPool:
+            self._discard_if_broken()
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+            # Part files of cancelled or failed ranges
+            for part_path in output_path.parent.glob(f".{output_path.name}.*.part"):
+                part_path.unlink(missing_ok=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+# Global PDF pool instance
+pdf_pool = PDFPool(config.PDF_WORKERS, config.PDF_TIMEOUT)
@@ -1,34 +1,54 @@
 from pathlib import Path
-from pdfminer.high_level import extract_text
 from loguru import logger
 from config import config
+from pdf_pool import pdf_pool
+from document_store import has_text, register_file
 import os
 
+class DuplicateDocument(Exception):
+    """The PDF's text was already ingested from another file, so nothing was saved."""
+
 def process_pdf(file_path: Path, original_filename: str) -> Path | None:
-    """Extracts text from a PDF file and saves it to the output directory."""
+    """Extracts text from a PDF file and saves it to the output directory.
+
+    Raises DuplicateDocument when the text duplicates an ingested document.
+    """
     logger.info(f"Processing PDF: {original_filename}")
+    output_path = part_path = None
     try:
-        # Extract text from the PDF
-        text = extract_text(str(file_path))
-
-        if not text.strip():
-            logger.warning(f"No text could be extracted from {original_filename}.")
-            return None
-
         # Generate a safe output path
         output_path = config.get_output_path(original_filename, is_file=True)
         
         # Ensure the output directory exists
         os.makedirs(output_path.parent, exist_ok=True)
 
-        # Save the extracted text
-        output_path.write_text(text, encoding='utf-8')
-        logger.info(f"Successfully processed and saved {original_filename} to {output_path}")
-        return output_path
+        # Extract page ranges in the PDF pool, streaming text to a file that only takes the
+        # output name once complete, so a crash never leaves a partial document to be indexed
+        part_path = output_path.with_name(f"{output_path.name}.part")
+        pages = pdf_pool.extract_to_file(str(file_path), part_path)
+
+        if not has_text(part_path):
+            logger.warning(f"No text could be extracted from {original_filename}.")
+            return None
+        part_path.replace(output_path)
+
+        # Drop the file (and skip ingestion) if identical content was already ingested
+        registered = register_file(original_filename, output_path)
+        if not registered:
+            raise DuplicateDocument(f"{original_filename} duplicates an ingested document")
+
+        logger.info(f"Successfully processed and saved {original_filename} ({pages} pages) to {registered}")
+        return registered
+    except DuplicateDocument:
+        raise
     except Exception as e:
         logger.critical(f"An error occurred while processing {original_filename}: {e}")
+        if output_path:
+            output_path.unlink(missing_ok=True)
         return None
     finally:
+        if part_path:
+            part_path.unlink(missing_ok=True)
         # Clean up the temporary file
         if os.path.exists(file_path):
             os.remove(file_path)
@@ -1,10 +1,11 @@
-import io
 import logging
+import tempfile
 from loguru import logger
 from typing import List, Dict, Any
+from pathlib import Path
 from config import config
-import pdfminer
-from pdfminer.high_level import extract_text
+from pdf_pool import pdf_pool
+from document_store import register_file
 import os
 
 # Ensure log directory exists
@@ -26,14 +27,23 @@ class PDFScraper:
         pass
 
     def extract_text(self, pdf_path: str) -> str:
-        """Extract text from a PDF file."""
+        """Extract text from a PDF file.
+
+        Pages are extracted range by range in the PDF pool, as in process_pdf_to_file,
+        which should be preferred for large documents: this returns the whole text.
+        """
+        fd, text_path = tempfile.mkstemp(suffix=".txt.part")
+        os.close(fd)
         try:
-            text = extract_text(pdf_path)
+            pdf_pool.extract_to_file(pdf_path, Path(text_path))
+            text = Path(text_path).read_text(encoding='utf-8', errors='ignore')
             logger.info(f"Successfully extracted text from {pdf_path}")
             return text
         except Exception as e:
             logger.error(f"Error extracting text from {pdf_path}: {str(e)}")
             return ""
+        finally:
+            os.remove(text_path)
 
     def clean_pdf_text(self, text: str) -> str:
         """Clean extracted PDF text by removing common artifacts."""
@@ -42,10 +52,46 @@ class PDFScraper:
         cleaned = "\n".join(line for line in cleaned.split("\n") if line.strip())
         return cleaned
 
-    def process_pdf(self, pdf_path: str) -> str:
+    def clean_pdf_file(self, raw_path: Path, output_path: Path) -> bool:
+        """Stream-clean extracted text line by line; returns whether any text was kept."""
+        kept = False
+        with open(raw_path, 'rb') as raw, open(output_path, 'wb') as out:
+            for line in raw:
+                if line.strip():
+                    out.write(line if line.endswith(b"\n") else line + b"\n")
+                    kept = True
+        return kept
+
+    def process_pdf_to_file(self, pdf_path: str, output_path: Path) -> bool:
+        """Extract, clean and save a PDF page range by page range without holding its whole text.
+
+        The text only appears at `output_path` once complete, so an interrupted
+        run never leaves a partial document for the indexes to pick up.
+        """
+        logger.info(f"Processing PDF: {pdf_path}")
+        raw_path = output_path.with_name(f".{output_path.name}.raw")
+        part_path = output_path.with_name(f"{output_path.name}.part")
+        try:
+            os.makedirs(output_path.parent, exist_ok=True)
+            pages = pdf_pool.extract_to_file(pdf_path, raw_path)
+            if not self.clean_pdf_file(raw_path, part_path):
+                logger.error(f"Failed to process PDF: {pdf_path}")
+                return False
+            part_path.replace(output_path)
+            logger.info(f"Successfully processed PDF: {pdf_path} ({pages} pages)")
+            return True
+        except Exception as e:
+            logger.error(f"Error extracting text from {pdf_path}: {str(e)}")
+            return False
+        finally:
+            raw_path.unlink(missing_ok=True)
+            part_path.unlink(missing_ok=True)
+
+    def process_pdf(self, pdf_path: str, text: str | None = None) -> str:
         """Process a PDF file and return cleaned text."""
         logger.info(f"Processing PDF: {pdf_path}")
-        text = self.extract_text(pdf_path)
+        if text is None:
+            text = self.extract_text(pdf_path)
         if not text:
             logger.error(f"Failed to process PDF: {pdf_path}")
             return ""
@@ -54,12 +100,16 @@ class PDFScraper:
         logger.info(f"Successfully processed PDF: {pdf_path}")
         return cleaned_text
 
-    def process_pdfs(self, pdf_paths: List[str]) -> Dict[str, str]:
-        """Process multiple PDF files."""
+    def process_pdfs(self, pdf_paths: List[str]) -> Dict[str, Path | None]:
+        """Process multiple PDF files into the output directory, each split across the extraction pool.
+
+        Returns the saved path per PDF, or None if it failed or duplicates an ingested document.
+        """
         results = {}
         for pdf_path in pdf_paths:
-            text = self.process_pdf(pdf_path)
-            results[pdf_path] = text
+            output_path = config.get_output_path(pdf_path)
+            registered = self.process_pdf_to_file(pdf_path, output_path) and register_file(pdf_path, output_path)
+            results[pdf_path] = registered or None
         return results
 
 async def main():
@@ -72,10 +122,8 @@ async def main():
     ]
     
     results = scraper.process_pdfs(pdf_paths)
-    for pdf_path, content in results.items():
-        if content:
-            output_path = config.get_output_path(pdf_path)
-            output_path.write_text(content, encoding='utf-8')
+    for pdf_path, output_path in results.items():
+        if output_path:
             logger.info(f"Saved content to {output_path}")
 
 if __name__ == "__main__":
@@ -5,8 +5,11 @@ from pathlib import Path
 from typing import List, Dict, Any
 from loguru import logger
 from config import config
-from web_scraper import WebScraper
+from web_scraper import WebScraper, ScrapedPage
+from crawler import Crawler
+from feed_reader import FeedReader
 from pdf_scraper import PDFScraper
+from http_session import session_manager
 import os
 
 # Ensure log directory exists with proper permissions
@@ -26,31 +29,68 @@ class RAGScraper:
         """Scrape and save web content."""
         logger.info(f"Scraping {len(urls)} web URLs")
         await self.web_scraper.init_session()
-        try:
-            results = await self.web_scraper.scrape_urls(urls)
-            for url, content in results.items():
-                if content:
-                    output_path = config.get_output_path(url)
-                    output_path.write_text(content, encoding='utf-8')
+        pages = await self.web_scraper.scrape_urls(urls)
+        results = {}
+        for url, page in pages.items():
+            results[url] = page.text
+            if page.has_content:
+                output_path = await asyncio.to_thread(page.save)
+                if output_path:
                     logger.info(f"Saved content from {url} to {output_path}")
-            return results
-        finally:
-            await self.web_scraper.close_session()
+                page.commit()
+        return results
+
+    async def crawl_web_content(self, seeds: List[str], max_depth: int = config.CRAWL_MAX_DEPTH,
+                                max_pages: int = config.CRAWL_MAX_PAGES) -> Dict[str, Path | None]:
+        """Crawl from seed URLs and save every new or changed page as soon as it is scraped."""
+        logger.info(f"Crawling from {len(seeds)} seed URLs (depth {max_depth}, up to {max_pages} pages)")
+        await self.web_scraper.init_session()
+
+        async def save_page(page: ScrapedPage) -> Path | None:
+            output_path = await asyncio.to_thread(page.save)
+            if output_path:
+                logger.info(f"Saved content from {page.url} to {output_path}")
+            return output_path
+
+        summary = await Crawler(self.web_scraper, max_depth, max_pages).crawl(seeds, save_page)
+        return summary["results"]
+
+    async def sync_feed_content(self, feed_urls: List[str]) -> Dict[str, Path | None]:
+        """Scrape and save the new and changed pages listed by sitemaps or RSS/Atom feeds."""
+        logger.info(f"Syncing {len(feed_urls)} sitemaps/feeds")
+        await self.web_scraper.init_session()
+
+        async def save_page(page: ScrapedPage) -> Path | None:
+            output_path = await asyncio.to_thread(page.save)
+            if output_path:
+                logger.info(f"Saved content from {page.url} to {output_path}")
+            return output_path
+
+        reader = FeedReader(self.web_scraper)
+        results = {}
+        for feed_url in feed_urls:
+            results.update((await reader.sync(feed_url, save_page))["results"])
+        return results
 
-    def scrape_pdf_content(self, pdf_paths: List[str]) -> Dict[str, str]:
-        """Scrape and save PDF content."""
+    def scrape_pdf_content(self, pdf_paths: List[str]) -> Dict[str, Path | None]:
+        """Scrape and save PDF content, streaming each document to its output file."""
         logger.info(f"Processing {len(pdf_paths)} PDF files")
         results = self.pdf_scraper.process_pdfs(pdf_paths)
-        for pdf_path, content in results.items():
-            if content:
-                output_path = config.get_output_path(pdf_path)
-                output_path.write_text(content, encoding='utf-8')
+        for pdf_path, output_path in results.items():
+            if output_path:
                 logger.info(f"Saved content from {pdf_path} to {output_path}")
         return results
 
-    async def process_content(self, urls: List[str], pdf_paths: List[str]):
-        """Process both web and PDF content."""
-        web_results = await self.scrape_web_content(urls)
+    async def process_content(self, urls: List[str], pdf_paths: List[str], crawl: bool = False,
+                              max_depth: int = config.CRAWL_MAX_DEPTH, max_pages: int = config.CRAWL_MAX_PAGES,
+                              feed_urls: List[str] | None = None):
+        """Process web, feed and PDF content; with `crawl`, the URLs are seeds of a crawl."""
+        if crawl:
+            web_results = await self.crawl_web_content(urls, max_depth, max_pages)
+        else:
+            web_results = await self.scrape_web_content(urls)
+        if feed_urls:
+            web_results.update(await self.sync_feed_content(feed_urls))
         pdf_results = self.scrape_pdf_content(pdf_paths)
         return web_results, pdf_results
 
@@ -58,6 +98,10 @@ async def main():
     """Main entry point for the RAG scraper."""
     parser = argparse.ArgumentParser(description='RAG Scraper for web pages and PDFs')
     parser.add_argument('--urls', nargs='+', help='List of URLs to scrape')
+    parser.add_argument('--crawl', action='store_true', help='Follow links from the URLs across their sites')
+    parser.add_argument('--max-depth', type=int, default=config.CRAWL_MAX_DEPTH, help='Link hops to follow when crawling')
+    parser.add_argument('--max-pages', type=int, default=config.CRAWL_MAX_PAGES, help='Pages to fetch at most when crawling')
+    parser.add_argument('--feeds', nargs='+', help='Sitemaps or RSS/Atom feeds whose new and changed pages to scrape')
     parser.add_argument('--pdfs', nargs='+', help='List of PDF files to process')
     parser.add_argument('--output-dir', default=config.OUTPUT_DIR, help='Output directory for processed content')
     parser.add_argument('--log-level', default=config.LOG_LEVEL, help='Logging level (DEBUG, INFO, WARNING, ERROR)')
@@ -73,7 +117,11 @@ async def main():
     try:
         web_results, pdf_results = await scraper.process_content(
             args.urls or [],
-            args.pdfs or []
+            args.pdfs or [],
+            crawl=args.crawl,
+            max_depth=args.max_depth,
+            max_pages=args.max_pages,
+            feed_urls=args.feeds or [],
         )
         
         logger.info("Scraping completed successfully")
@@ -88,6 +136,8 @@ async def main():
     except Exception as e:
         logger.error(f"Error during scraping: {str(e)}")
         raise
+    finally:
+        await session_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
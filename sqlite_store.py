@@ -0,0 +1,36 @@
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+# SQLite's default limit on bound parameters is 999
+PARAM_BATCH = 500
+
+class SQLiteStore:
+    """Base of the stores kept in a SQLite database file at `db_path`.
+
+    Every operation opens its own short-lived autocommit connection in WAL
+    mode, so one store is safe to share between threads and processes;
+    writes that must be atomic start their own BEGIN IMMEDIATE transaction.
+    """
+
+    db_path: Path
+    row_factory: Optional[Callable[..., Any]] = None
+
+    def _create(self, schema: str):
+        """Create the database, its directory and `schema` where missing."""
+        self.db_path = Path(self.db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(schema)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import chunker
+from chunker import TextChunker
+
+class CharEncoder:
+    """One token per character, so token counts are easy to reason about."""
+
+    def encode_ordinary(self, text: str) -> list[int]:
+        return [ord(char) for char in text]
+
+    def encode_ordinary_batch(self, texts: list[str], num_threads: int = 1) -> list[list[int]]:
+        return [self.encode_ordinary(text) for text in texts]
+
+    def decode(self, tokens: list[int]) -> str:
+        return "".join(chr(token) for token in tokens)
+
+@pytest.fixture(autouse=True)
+def char_encoder(monkeypatch):
+    monkeypatch.setattr(chunker, "get_encoder", lambda encoding_name=None: CharEncoder())
+
+def test_block_after_a_nearly_full_chunk_stays_within_max_tokens():
+    chunks = TextChunker(max_tokens=50, overlap=10).chunk("a" * 49 + "\n\n" + "b" * 100)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert "".join(chunk.replace("\n", "") for chunk in chunks).count("b") >= 100
+
+def test_split_block_continues_its_overlap_without_a_separator():
+    text = "the quick brown fox jumps over the lazy dog and keeps running " * 5
+    chunks = TextChunker(max_tokens=50, overlap=10).chunk(text)
+    assert len(chunks) > 1
+    assert not any("\n\n" in chunk for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.startswith(previous[-10:])
+
+def test_every_chunk_is_within_max_tokens():
+    rng = random.Random(0)
+    for _ in range(300):
+        max_tokens = rng.randint(20, 120)
+        overlap = rng.randint(0, max_tokens - 3)
+        blocks = ["x" * rng.randint(1, 3 * max_tokens) for _ in range(rng.randint(1, 12))]
+        chunks = TextChunker(max_tokens=max_tokens, overlap=overlap).chunk("\n\n".join(blocks))
+        assert chunks
+        assert all(len(chunk) <= max_tokens for chunk in chunks)
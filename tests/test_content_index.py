@@ -0,0 +1,38 @@
+import sqlite3
+
+from content_index import ContentIndex, content_hash
+
+def test_duplicate_reports_whether_first_copy_was_ingested(tmp_path):
+    index = ContentIndex(tmp_path / "content.db")
+    digest = content_hash("the same article")
+    assert index.claim("https://a.example/post", digest, tmp_path / "a.txt") is None
+
+    assert index.claim("https://b.example/post", digest, tmp_path / "b.txt") == (str(tmp_path / "a.txt"), False)
+    index.mark_ingested(tmp_path / "a.txt")
+    assert index.claim("https://b.example/post", digest, tmp_path / "b.txt") == (str(tmp_path / "a.txt"), True)
+
+def test_existing_index_treats_old_entries_as_ingested(tmp_path):
+    db_path = tmp_path / "content.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE contents (content_hash TEXT PRIMARY KEY, path TEXT NOT NULL, source TEXT NOT NULL, created_at REAL NOT NULL)")
+        conn.execute("INSERT INTO contents VALUES ('abc', '/old.txt', 'https://old.example', 0)")
+
+    index = ContentIndex(db_path)
+    assert index.claim("https://new.example", "abc", tmp_path / "new.txt") == ("/old.txt", True)
+    assert index.claim("https://new.example", "def", tmp_path / "new.txt") is None
+    assert index.claim("https://other.example", "def", tmp_path / "x.txt") == (str(tmp_path / "new.txt"), False)
+
+def test_sources_map_to_their_latest_content(tmp_path):
+    index = ContentIndex(tmp_path / "content.db")
+    first, second = content_hash("first version"), content_hash("second version")
+    assert index.source_hash("https://a.example/post") is None
+
+    index.claim("https://a.example/post", first, tmp_path / "a1.txt")
+    assert index.source_hash("https://a.example/post") == first
+    index.claim("https://a.example/post", second, tmp_path / "a2.txt")
+    assert index.source_hash("https://a.example/post") == second
+
+    # A duplicate still records which content its source now serves, and the mapping survives a restart
+    index.claim("https://b.example/post", first, tmp_path / "b.txt")
+    assert ContentIndex(tmp_path / "content.db").source_hash("https://b.example/post") == first
+    assert index.lookup(first) == (str(tmp_path / "a1.txt"), False)
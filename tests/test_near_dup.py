@@ -0,0 +1,36 @@
+import random
+
+from near_dup import NearDuplicateIndex
+
+def _article(seed: int, words: int = 1500) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    return [rng.choice(vocabulary) for _ in range(words)]
+
+def _edited(words: list[str], changes: int) -> list[str]:
+    edited = list(words)
+    for position in range(changes):
+        edited[position * 500 + 7] = f"edited{position}"
+    return edited
+
+def test_edit_of_same_source_replaces_its_signature(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "near_dup.db")
+    original = _article(1)
+    assert index.check_and_add("https://example.com/page", tmp_path / "v1.txt", [" ".join(original)]) is None
+
+    edited = _edited(original, 2)
+    assert index.check_and_add("https://example.com/page", tmp_path / "v2.txt", [" ".join(edited)]) is None
+
+    with index._connect() as conn:
+        paths = [row[0] for row in conn.execute("SELECT path FROM signatures WHERE source = ?", ("https://example.com/page",))]
+    assert paths == [str(tmp_path / "v2.txt")]
+
+def test_edit_from_another_source_is_a_near_duplicate(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "near_dup.db")
+    original = _article(1)
+    index.check_and_add("https://example.com/page", tmp_path / "v1.txt", [" ".join(original)])
+
+    match = index.check_and_add("https://mirror.example.org/page", tmp_path / "copy.txt", [" ".join(_edited(original, 2))])
+    assert match is not None
+    assert match[0] == str(tmp_path / "v1.txt")
+    assert match[1] >= index.threshold
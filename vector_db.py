@@ -1,128 +1,493 @@
+import asyncio
+import json as json_module
 import os
-import requests
+import threading
+import time
+import aiohttp
 from pathlib import Path
 from loguru import logger
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from config import config
+from http_session import session_manager
+from fetch_scheduler import AsyncSemaphore
+from ingest_outbox import ingest_outbox, jittered_backoff, OutboxRecord
 
 # Get Open WebUI configuration from environment variables
 OPEN_WEBUI_URL = os.getenv("OPEN_WEBUI_URL", "http://openwebui:8080")
 COLLECTION_NAME = "rag_documents"
 
-def _get_collection_id(collection_name: str, headers: dict) -> Optional[str]:
+class CollectionNotFoundError(Exception):
+    """Raised when Open WebUI reports that a cached collection no longer exists."""
+
+class OpenWebUIError(Exception):
+    """Raised when Open WebUI answers with an error status or an unreadable body."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class CircuitOpenError(OpenWebUIError):
+    """Raised instead of sending a request while Open WebUI is considered down."""
+
+class AdaptiveRateLimiter:
     """
-    Gets the ID of a knowledge base collection by its name.
+    Spaces out requests to Open WebUI and adapts to its responses.
+
+    Starts with no delay between requests. A 429 or 5xx response doubles the
+    interval between request starts (or honours Retry-After); each success
+    shrinks it again, so throughput settles just below what the server accepts.
     """
-    url = f"{OPEN_WEBUI_URL}/api/v1/knowledge/"
-    logger.info(f"Attempting to find collection '{collection_name}'...")
+
+    def __init__(self, base_interval: float = config.INGEST_BACKOFF_BASE, max_interval: float = config.INGEST_BACKOFF_MAX):
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.interval = 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    async def wait(self):
+        """Sleep until this caller may start its request."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def record(self, status_code: int, retry_after: Optional[float] = None):
+        """Adjust the interval based on a response status."""
+        with self._lock:
+            if status_code == 429 or status_code >= 500:
+                self.interval = min(max(self.interval * 2, self.base_interval, retry_after or 0), self.max_interval)
+                self._next_start = max(self._next_start, time.monotonic() + self.interval)
+                logger.warning(f"Open WebUI returned {status_code}; slowing to one request every {self.interval:.2f}s")
+            elif self.interval:
+                self.interval = self.interval / 2 if self.interval > self.base_interval / 8 else 0.0
+
+    def reset(self):
+        """Restart from the base interval, e.g. after an outage inflated it."""
+        with self._lock:
+            self.interval = self.base_interval
+            self._next_start = time.monotonic()
+
+def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
     try:
-        response = requests.get(url, headers=headers, timeout=60)
-        response.raise_for_status()
-        collections = response.json()
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+class CircuitBreaker:
+    """
+    Stops traffic to Open WebUI while it is down.
+
+    Closed: requests flow and consecutive failures (connection errors, 5xx)
+    are counted. After `threshold` of them the circuit opens and requests fail
+    fast. Once `reset_timeout` has passed it is half-open: a single probe is
+    let through, which closes the circuit on success or reopens it on failure.
+    """
+
+    def __init__(self, threshold: int = config.INGEST_BREAKER_THRESHOLD, reset_timeout: float = config.INGEST_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def closed(self) -> bool:
+        return self.state == "closed"
+
+    def retry_in(self) -> float:
+        """Seconds until a request may be attempted again (0 unless the circuit is open)."""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in half-open state only one probe is allowed."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() >= self._opened_at + self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> bool:
+        """Record a response from a live server; returns True if this closed the circuit."""
+        with self._lock:
+            reopened = self.state != "closed"
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+        if reopened:
+            logger.success("Open WebUI is reachable again; circuit closed")
+        return reopened
+
+    def release_probe(self):
+        """Let another probe through after one ended without an answer (cancelled, or failed on our side)."""
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+                logger.error(f"Open WebUI looks down after {self.failures} failures; pausing ingestion for {self.reset_timeout:.0f}s")
+
+class OpenWebUIClient:
+    """
+    Shared Open WebUI client.
+
+    Async, over the pooled aiohttp session of the running event loop, so
+    uploads overlap with scraping on the same loop. At most INGEST_CONCURRENCY
+    requests are in flight across all loops. Collection IDs are kept in an
+    in-process, TTL-bounded cache by name; lookup and creation of a collection
+    are single-flight, so concurrent ingestions never create duplicates.
+
+    Failed requests are retried with jittered exponential backoff, and a
+    circuit breaker fails them fast while Open WebUI is down. A document whose
+    ingestion still fails is parked in the outbox at the step it reached and
+    redelivered by a background drainer, which also starts when the circuit closes.
+    """
+
+    def __init__(self, base_url: str = OPEN_WEBUI_URL, collection_ttl: float = config.COLLECTION_CACHE_TTL):
+        self.base_url = base_url
+        self.collection_ttl = collection_ttl
+        self.rate_limiter = AdaptiveRateLimiter()
+        self.in_flight = AsyncSemaphore(config.INGEST_CONCURRENCY)
+        self.breaker = CircuitBreaker()
+        self._drainer: Optional[threading.Thread] = None
+        self._drain_lock = threading.Lock()
+        self._collection_ids: Dict[str, Tuple[str, float]] = {}
+        # AsyncSemaphore rather than asyncio.Lock: job workers each run their own event loop
+        self._collection_locks: Dict[str, AsyncSemaphore] = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return os.getenv("OPEN_WEBUI_API_KEY")
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    async def _request(self, method: str, url: str, json: Any = None, file: Optional[Tuple[str, bytes]] = None) -> Any:
+        """Send a request through the rate limiter and circuit breaker.
+
+        Connection errors, timeouts, 429s and 5xx responses are retried with
+        jittered exponential backoff. Returns the decoded JSON body; raises
+        OpenWebUIError for error statuses and CircuitOpenError while Open WebUI
+        is down. `file` is a (name, content) pair sent as multipart.
+        """
+        session = await session_manager.get_session()
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with self.in_flight:
+            for attempt in range(config.INGEST_MAX_RETRIES):
+                if not self.breaker.allow():
+                    raise CircuitOpenError(f"Open WebUI circuit is open; not sending {method} {url}")
+                probe = not self.breaker.closed
+                try:
+                    await self.rate_limiter.wait()
+                    data = None
+                    if file:
+                        # Rebuilt per attempt: a multipart body can only be sent once
+                        data = aiohttp.FormData()
+                        data.add_field("file", file[1], filename=file[0], content_type="text/plain")
+                    async with session.request(method, url, headers=self.headers, json=json, data=data, timeout=timeout) as response:
+                        body = await response.text()
+                        status = response.status
+                        retry_after = _retry_after(response)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Connection errors and timeouts count against the server; cancellation and bugs don't
+                    self.breaker.record_failure()
+                    if attempt + 1 == config.INGEST_MAX_RETRIES:
+                        raise
+                    logger.warning(f"{method} {url} failed ({e!r}), attempt {attempt + 1}/{config.INGEST_MAX_RETRIES}")
+                    await asyncio.sleep(jittered_backoff(attempt, config.INGEST_BACKOFF_BASE, config.INGEST_BACKOFF_MAX))
+                    continue
+                except BaseException:
+                    # A probe that ends without an answer must free its slot, or the circuit stays half-open for good
+                    if probe:
+                        self.breaker.release_probe()
+                    raise
+                self.rate_limiter.record(status, retry_after)
+                if status >= 500:
+                    self.breaker.record_failure()
+                elif self.breaker.record_success():
+                    # Outage over: 5xx answers while it lasted shouldn't keep throttling recovery
+                    self.rate_limiter.reset()
+                    self.start_outbox_drainer()
+                if status != 429 and status < 500:
+                    break
+                if attempt + 1 < config.INGEST_MAX_RETRIES:
+                    await asyncio.sleep(jittered_backoff(attempt, config.INGEST_BACKOFF_BASE, config.INGEST_BACKOFF_MAX))
+        if status >= 400:
+            raise OpenWebUIError(f"{method} {url} returned {status}: {body}", status)
+        try:
+            return json_module.loads(body) if body else None
+        except ValueError:
+            raise OpenWebUIError(f"{method} {url} returned a non-JSON body: {body[:200]}", status)
+
+    def _collection_lock(self, collection_name: str) -> AsyncSemaphore:
+        with self._locks_guard:
+            return self._collection_locks.setdefault(collection_name, AsyncSemaphore(1))
+
+    def _cached_collection_id(self, collection_name: str) -> Optional[str]:
+        cached = self._collection_ids.get(collection_name)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+
+    def invalidate_collection(self, collection_name: str):
+        """Drop a cached collection ID so the next lookup goes to the server."""
+        self._collection_ids.pop(collection_name, None)
+
+    async def find_collection(self, collection_name: str) -> Optional[str]:
+        """
+        Gets the ID of a knowledge base collection by its name from the server.
+        Returns None only if the server listed its collections and this one was not among them;
+        raises OpenWebUIError (or a connection error) if they could not be listed.
+        """
+        url = f"{self.base_url}/api/v1/knowledge/"
+        logger.info(f"Attempting to find collection '{collection_name}'...")
+        collections = await self._request("GET", url)
+        if not isinstance(collections, list):
+            raise OpenWebUIError(f"GET {url} returned an unexpected body: {str(collections)[:200]}")
         for collection in collections:
-            if collection.get("name") == collection_name:
+            if isinstance(collection, dict) and collection.get("name") == collection_name:
                 collection_id = collection.get("id")
                 logger.success(f"Found collection '{collection_name}' with ID: {collection_id}")
                 return collection_id
         logger.warning(f"Collection '{collection_name}' not found.")
         return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to get collections: {e}")
-        logger.error(f"Response body: {e.response.text if e.response else 'No response'}")
-        return None
 
-def _create_collection(collection_name: str, headers: dict) -> Optional[str]:
-    """
-    Creates a new knowledge base collection.
-    """
-    url = f"{OPEN_WEBUI_URL}/api/v1/knowledge/create"
-    payload = {
-        "name": collection_name,
-        "description": f"RAG documents collection: {collection_name}"
-    }
-    logger.info(f"Creating collection '{collection_name}'...")
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        collection_id = data.get("id")
+    async def create_collection(self, collection_name: str, description: Optional[str] = None) -> Optional[str]:
+        """
+        Creates a new knowledge base collection.
+        """
+        url = f"{self.base_url}/api/v1/knowledge/create"
+        payload = {
+            "name": collection_name,
+            "description": description or f"RAG documents collection: {collection_name}"
+        }
+        logger.info(f"Creating collection '{collection_name}'...")
+        try:
+            data = await self._request("POST", url, json=payload) or {}
+            collection_id = data.get("id")
+            if collection_id:
+                logger.success(f"Successfully created collection '{collection_name}' with ID: {collection_id}")
+                return collection_id
+            else:
+                logger.error(f"Collection created, but no ID was returned. Response: {data}")
+                return None
+        except (aiohttp.ClientError, asyncio.TimeoutError, OpenWebUIError) as e:
+            logger.error(f"Failed to create collection: {e}")
+            return None
+
+    async def get_or_create_collection(self, collection_name: str, description: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the collection ID from the cache, or finds or creates it on the server.
+        """
+        collection_id = self._cached_collection_id(collection_name)
         if collection_id:
-            logger.success(f"Successfully created collection '{collection_name}' with ID: {collection_id}")
             return collection_id
-        else:
-            logger.error(f"Collection created, but no ID was returned. Response: {data}")
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to create collection: {e}")
-        logger.error(f"Response body: {e.response.text if e.response else 'No response'}")
-        return None
+        # Single flight: only one caller per collection talks to the server
+        async with self._collection_lock(collection_name):
+            collection_id = self._cached_collection_id(collection_name)
+            if collection_id:
+                return collection_id
+            try:
+                collection_id = await self.find_collection(collection_name)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OpenWebUIError) as e:
+                # Creating it now could duplicate a collection the failed listing would have shown;
+                # the caller parks the document and the outbox retries the lookup
+                logger.error(f"Failed to get collections, so not creating '{collection_name}': {e}")
+                return None
+            if not collection_id:
+                collection_id = await self.create_collection(collection_name, description)
+            if collection_id:
+                self._collection_ids[collection_name] = (collection_id, time.monotonic() + self.collection_ttl)
+            return collection_id
 
-def _upload_file(file_path: Path, headers: dict) -> Optional[str]:
-    """
-    Uploads a file to the Open WebUI files endpoint.
-    """
-    url = f"{OPEN_WEBUI_URL}/api/v1/files/"
-    logger.info(f"Uploading {file_path.name} to Open WebUI...")
-    try:
-        with open(file_path, "rb") as f:
-            files = {"file": (file_path.name, f, "text/plain")}
-            response = requests.post(url, files=files, headers=headers, timeout=60)
-            response.raise_for_status()
-        data = response.json()
-        doc_id = data.get("id")
-        if doc_id:
-            logger.success(f"Successfully uploaded file. Document ID: {doc_id}")
-            return doc_id
-        else:
-            logger.error(f"File uploaded, but no document ID was returned. Response: {data}")
+    async def upload_file(self, file_path: Path) -> Optional[str]:
+        """
+        Uploads a file to the Open WebUI files endpoint.
+        """
+        url = f"{self.base_url}/api/v1/files/"
+        logger.info(f"Uploading {file_path.name} to Open WebUI...")
+        try:
+            # Read the content up front so a retried request resends the whole file
+            content = await asyncio.to_thread(file_path.read_bytes)
+            data = await self._request("POST", url, file=(file_path.name, content)) or {}
+            doc_id = data.get("id")
+            if doc_id:
+                logger.success(f"Successfully uploaded file. Document ID: {doc_id}")
+                return doc_id
+            else:
+                logger.error(f"File uploaded, but no document ID was returned. Response: {data}")
+                return None
+        except (aiohttp.ClientError, asyncio.TimeoutError, OpenWebUIError, OSError) as e:
+            logger.error(f"Failed to upload file {file_path.name}: {e}")
             return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to upload file {file_path.name}: {e}")
-        logger.error(f"Response body: {e.response.text if e.response else 'No response'}")
-        return None
 
-def _add_file_to_collection(collection_id: str, doc_id: str, headers: dict) -> bool:
-    """
-    Adds a previously uploaded document to the specified RAG collection.
-    """
-    url = f"{OPEN_WEBUI_URL}/api/v1/knowledge/{collection_id}/file/add"
-    payload = {"file_id": doc_id}
-    logger.info(f"Adding document {doc_id} to collection ID {collection_id}...")
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=60)
-        response.raise_for_status()
-        logger.success(f"Successfully added document {doc_id} to collection.")
+    async def add_file_to_collection(self, collection_id: str, doc_id: str) -> bool:
+        """
+        Adds a previously uploaded document to the specified RAG collection.
+        Raises CollectionNotFoundError if the collection no longer exists.
+        """
+        url = f"{self.base_url}/api/v1/knowledge/{collection_id}/file/add"
+        payload = {"file_id": doc_id}
+        logger.info(f"Adding document {doc_id} to collection ID {collection_id}...")
+        try:
+            await self._request("POST", url, json=payload)
+            logger.success(f"Successfully added document {doc_id} to collection.")
+            return True
+        except OpenWebUIError as e:
+            if e.status == 404:
+                raise CollectionNotFoundError(f"Collection {collection_id} not found") from e
+            logger.error(f"Failed to add document {doc_id} to collection: {e}")
+            return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to add document {doc_id} to collection: {e}")
+            return False
+
+    async def add_document(self, file_path: Path, collection_name: str = COLLECTION_NAME) -> bool:
+        """
+        Uploads a file and adds it to the named collection.
+        On failure the document is parked in the outbox and retried in the background.
+        """
+        record = ingest_outbox.get(file_path, collection_name)
+        if record and record.attempts < ingest_outbox.max_attempts:
+            logger.info(f"{file_path.name} is already waiting in the ingestion outbox; leaving it to the drainer.")
+            return False
+        # A record the drainer gave up on is retried here, resuming from its uploaded doc_id if it has one
+        return await self._deliver(file_path, collection_name, record.doc_id if record else None)
+
+    async def _deliver(self, file_path: Path, collection_name: str, document_id: Optional[str] = None) -> bool:
+        """Run the remaining ingestion steps, parking the document at the step that failed."""
+        # Step 1: Get the collection ID, or create it if it doesn't exist.
+        collection_id = await self.get_or_create_collection(collection_name)
+        if not collection_id:
+            logger.error(f"Could not find or create collection '{collection_name}'. Halting.")
+            self._park(file_path, collection_name, document_id, "collection lookup failed")
+            return False
+
+        # Step 2: Upload the file to get a document ID, unless an earlier attempt already did
+        if not document_id:
+            document_id = await self.upload_file(file_path)
+            if not document_id:
+                logger.error("Halting ingestion process due to upload failure.")
+                self._park(file_path, collection_name, None, "upload failed")
+                return False
+
+        # Step 3: Add the document to the collection, re-resolving it once if it was deleted
+        try:
+            added = await self.add_file_to_collection(collection_id, document_id)
+        except CollectionNotFoundError:
+            logger.warning(f"Cached collection '{collection_name}' ({collection_id}) is gone; refreshing")
+            self.invalidate_collection(collection_name)
+            collection_id = await self.get_or_create_collection(collection_name)
+            added = False
+            if not collection_id:
+                logger.error(f"Could not find or create collection '{collection_name}'. Halting.")
+            else:
+                try:
+                    added = await self.add_file_to_collection(collection_id, document_id)
+                except CollectionNotFoundError as e:
+                    logger.error(f"Failed to add document {document_id} to collection: {e}")
+        if not added:
+            # Keep the doc_id so the uploaded file is added later rather than orphaned
+            self._park(file_path, collection_name, document_id, "add to collection failed")
+            return False
+        ingest_outbox.remove(file_path, collection_name)
         return True
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to add document {doc_id} to collection: {e}")
-        logger.error(f"Response body: {e.response.text if e.response else 'No response'}")
-        return False
 
-def add_document_to_webui(file_path: Path):
+    def is_pending(self, file_path: Path, collection_name: str = COLLECTION_NAME) -> bool:
+        """Whether a document is parked in the outbox and will be redelivered."""
+        return ingest_outbox.contains(file_path, collection_name)
+
+    def _park(self, file_path: Path, collection_name: str, document_id: Optional[str], error: str):
+        attempts = ingest_outbox.put(file_path, collection_name, document_id, error)
+        if attempts >= ingest_outbox.max_attempts:
+            logger.error(f"Giving up on {file_path.name} after {attempts} attempts ({error}); it stays in the outbox for inspection.")
+            return
+        logger.warning(f"Parked {file_path.name} in the ingestion outbox ({error}, attempt {attempts}).")
+        self.start_outbox_drainer()
+
+    def start_outbox_drainer(self):
+        """Start the background thread that redelivers parked documents, unless it is already running."""
+        with self._drain_lock:
+            if self._drainer is not None:
+                return
+            self._drainer = threading.Thread(target=self._run_drainer, name="webui-outbox", daemon=True)
+            self._drainer.start()
+
+    def _run_drainer(self):
+        async def run():
+            try:
+                await self._drain_outbox()
+            finally:
+                await session_manager.close()
+        try:
+            asyncio.run(run())
+        finally:
+            with self._drain_lock:
+                if self._drainer is threading.current_thread():
+                    self._drainer = None
+
+    async def _drain_outbox(self):
+        """Redeliver due outbox records until none are left to retry."""
+        while True:
+            wait = self.breaker.retry_in()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            # While the circuit is not closed, probe with a single document
+            records = ingest_outbox.due(config.INGEST_CONCURRENCY if self.breaker.closed else 1)
+            if records:
+                await asyncio.gather(*(self._redeliver(record) for record in records))
+                continue
+            with self._drain_lock:
+                next_due = ingest_outbox.next_due_in()
+                if next_due is None:
+                    # Cleared under the lock so a concurrent _park starts a fresh drainer
+                    self._drainer = None
+                    logger.info("Ingestion outbox drained.")
+                    return
+            await asyncio.sleep(min(next_due, config.OUTBOX_RETRY_MAX))
+
+    async def _redeliver(self, record: OutboxRecord):
+        file_path = Path(record.file_path)
+        if not record.doc_id and not file_path.exists():
+            logger.warning(f"{file_path.name} no longer exists; dropping it from the ingestion outbox.")
+            ingest_outbox.remove(file_path, record.collection_name)
+            return
+        logger.info(f"Retrying {file_path.name} from the '{record.step}' step (attempt {record.attempts + 1}).")
+        if await self._deliver(file_path, record.collection_name, record.doc_id):
+            logger.success(f"Delivered {file_path.name} from the ingestion outbox.")
+
+# Global client instance
+webui_client = OpenWebUIClient()
+
+async def add_document_to_webui(file_path: Path) -> bool:
     """
     Processes a single text file and ingests it into Open WebUI's RAG.
     """
     logger.info(f"Starting ingestion process for {file_path.name}...")
-    
-    api_key = os.getenv("OPEN_WEBUI_API_KEY")
-    if not api_key:
+
+    if not webui_client.api_key:
         logger.error("OPEN_WEBUI_API_KEY not set. Halting ingestion.")
-        return
-    headers = {"Authorization": f"Bearer {api_key}"}
-
-    # Step 1: Get the collection ID, or create it if it doesn't exist.
-    collection_id = _get_collection_id(COLLECTION_NAME, headers)
-    if not collection_id:
-        collection_id = _create_collection(COLLECTION_NAME, headers)
-    
-    if not collection_id:
-        logger.error(f"Could not find or create collection '{COLLECTION_NAME}'. Halting.")
-        return
-
-    # Step 2: Upload the file to get a document ID
-    document_id = _upload_file(file_path, headers)
-    if not document_id:
-        logger.error("Halting ingestion process due to upload failure.")
-        return
-
-    # Step 3: Add the document to the collection
-    _add_file_to_collection(collection_id, document_id, headers)
+        return False
+
+    return await webui_client.add_document(file_path)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+In-process vector index over chunk embeddings, stored as memory-mapped float32 matrices
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence
+import numpy as np
+from loguru import logger
+from config import config
+from sqlite_store import PARAM_BATCH, SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    row INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    source TEXT,
+    snippet TEXT,
+    live INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_vectors_live_doc ON vectors (doc_id) WHERE live = 1;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first, without sorting the whole array."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+@dataclass
+class _Snapshot:
+    """Read-only view of the index as of one committed version."""
+    version: int
+    rows: int
+    matrix: Optional[np.ndarray]
+    live: np.ndarray
+    ann: Optional[dict]
+
+class VectorIndex(SQLiteStore):
+    """Cosine-similarity index of L2-normalized chunk embeddings.
+
+    Vectors are appended to a raw float32 file that readers memory-map as an
+    (N, dim) matrix, so the page cache is shared with every API worker and
+    nothing is loaded up front. Row metadata lives in SQLite; re-adding a
+    document ID tombstones its old row instead of rewriting the matrix.
+
+    Exact search is a single matrix-vector product over every row. For large
+    corpora `build_ann` writes an inverted-file (IVF) index: rows are clustered
+    with spherical k-means and stored contiguously per cluster, so a query only
+    scores the `nprobe` clusters nearest to it plus rows added since the build.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.db_path = self.directory / "vectors.db"
+        self.vectors_path = self.directory / "vectors.f32"
+        self._create(SCHEMA)
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read_meta(conn) -> dict:
+        return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+
+    @staticmethod
+    def _write_meta(conn, **values):
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            [(key, json.dumps(value)) for key, value in values.items()],
+        )
+
+    def _ann_path(self, name: str) -> Path:
+        return self.directory / f"ivf_{name}"
+
+    def add(self, doc_ids: Sequence[str], vectors: np.ndarray, sources: Sequence[str], snippets: Sequence[str]):
+        """Append vectors for the given document IDs, replacing any previous vectors of the same IDs."""
+        vectors = np.ascontiguousarray(_normalize(np.asarray(vectors, dtype=np.float32)))
+        if len(doc_ids) == 0:
+            return
+        with self._connect() as conn:
+            # The write lock also serializes appends to the matrix file across processes
+            conn.execute("BEGIN IMMEDIATE")
+            meta = self._read_meta(conn)
+            dim = meta.get("dim", vectors.shape[1])
+            if vectors.shape[1] != dim:
+                conn.execute("ROLLBACK")
+                raise ValueError(f"Vector index holds {dim}-dimensional vectors, got {vectors.shape[1]}")
+            start = meta.get("rows", 0)
+            with open(self.vectors_path, "ab") as f:
+                # Drop rows a crashed writer appended but never committed
+                f.truncate(start * dim * 4)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            ids = list(doc_ids)
+            for i in range(0, len(ids), PARAM_BATCH):
+                batch = ids[i:i + PARAM_BATCH]
+                conn.execute(
+                    f"UPDATE vectors SET live = 0 WHERE live = 1 AND doc_id IN ({','.join('?' * len(batch))})", batch
+                )
+            conn.executemany(
+                "INSERT INTO vectors (row, doc_id, source, snippet) VALUES (?, ?, ?, ?)",
+                [(start + i, doc_id, source, snippet)
+                 for i, (doc_id, source, snippet) in enumerate(zip(ids, sources, snippets))],
+            )
+            self._write_meta(conn, dim=dim, rows=start + len(ids), version=meta.get("version", 0) + 1)
+            conn.execute("COMMIT")
+
+    def live_ids(self, doc_ids: Sequence[str]) -> set:
+        """The subset of `doc_ids` that currently have a vector in the index."""
+        ids, found = list(doc_ids), set()
+        with self._connect() as conn:
+            for i in range(0, len(ids), PARAM_BATCH):
+                batch = ids[i:i + PARAM_BATCH]
+                found.update(doc_id for (doc_id,) in conn.execute(
+                    f"SELECT doc_id FROM vectors WHERE live = 1 AND doc_id IN ({','.join('?' * len(batch))})", batch
+                ))
+        return found
+
+    def _load(self) -> _Snapshot:
+        """Current snapshot, re-mapping the files only when another writer committed since the last call."""
+        with self._connect() as conn:
+            meta = self._read_meta(conn)
+            version = meta.get("version", 0)
+            with self._lock:
+                if self._snapshot is not None and self._snapshot.version == version:
+                    return self._snapshot
+            rows, dim = meta.get("rows", 0), meta.get("dim", 0)
+            dead = np.fromiter((row for (row,) in conn.execute("SELECT row FROM vectors WHERE live = 0")), dtype=np.int64)
+        matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim)) if rows else None
+        live = np.ones(rows, dtype=bool)
+        live[dead[dead < rows]] = False
+        ann = None
+        if meta.get("ann") and meta["ann"]["dim"] == dim:
+            info = meta["ann"]
+            ann = {
+                "rows": info["rows"],
+                "centroids": np.fromfile(self._ann_path("centroids.f32"), dtype=np.float32).reshape(info["nlist"], dim),
+                "offsets": np.fromfile(self._ann_path("offsets.i64"), dtype=np.int64),
+                "ids": np.memmap(self._ann_path("rows.i64"), dtype=np.int64, mode="r"),
+                "vectors": np.memmap(self._ann_path("vectors.f32"), dtype=np.float32, mode="r", shape=(info["covered"], dim)),
+            }
+        snapshot = _Snapshot(version, rows, matrix, live, ann)
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def __len__(self) -> int:
+        return int(self._load().live.sum())
+
+    def search(self, query: np.ndarray, k: int = config.SEARCH_TOP_K, approximate: Optional[bool] = None,
+               nprobe: int = config.ANN_NPROBE) -> List[dict]:
+        """Return the k rows most similar to `query` as dicts with doc_id, source, snippet and score.
+
+        `approximate` forces the IVF index on or off; by default it is used when
+        it has been built and the index holds at least ANN_MIN_ROWS vectors.
+        """
+        snapshot = self._load()
+        if snapshot.matrix is None or k < 1:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32).ravel())
+        if approximate is None:
+            approximate = snapshot.rows >= config.ANN_MIN_ROWS
+        if approximate and snapshot.ann is not None:
+            rows, scores = self._ann_scores(snapshot, query, nprobe)
+        else:
+            rows, scores = None, snapshot.matrix @ query
+        live = snapshot.live if rows is None else snapshot.live[rows]
+        scores = np.where(live, scores, -np.inf)
+        top = _top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        hits = [(int(top_row if rows is None else rows[top_row]), float(scores[top_row])) for top_row in top]
+        return self._describe(hits)
+
+    def _ann_scores(self, snapshot: _Snapshot, query: np.ndarray, nprobe: int):
+        """Candidate rows and their scores from the nearest IVF clusters and the unclustered tail."""
+        ann = snapshot.ann
+        offsets = ann["offsets"]
+        probes = _top_k(ann["centroids"] @ query, min(nprobe, len(offsets) - 1))
+        rows, scores = [], []
+        for cluster in probes:
+            start, end = offsets[cluster], offsets[cluster + 1]
+            if start < end:
+                rows.append(ann["ids"][start:end])
+                scores.append(ann["vectors"][start:end] @ query)
+        if snapshot.rows > ann["rows"]:
+            # Rows appended after the IVF build are scored exactly until the next build
+            rows.append(np.arange(ann["rows"], snapshot.rows))
+            scores.append(snapshot.matrix[ann["rows"]:] @ query)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(scores)
+
+    def _describe(self, hits: list) -> List[dict]:
+        if not hits:
+            return []
+        with self._connect() as conn:
+            described = {
+                row: (doc_id, source, snippet) for row, doc_id, source, snippet in conn.execute(
+                    f"SELECT row, doc_id, source, snippet FROM vectors WHERE row IN ({','.join('?' * len(hits))})",
+                    [row for row, _ in hits],
+                )
+            }
+        return [
+            {"doc_id": described[row][0], "source": described[row][1], "snippet": described[row][2], "score": round(score, 6)}
+            for row, score in hits if row in described
+        ]
+
+    def build_ann(self, nlist: Optional[int] = None, iterations: int = config.ANN_TRAIN_ITERATIONS,
+                  sample_size: int = config.ANN_TRAIN_SAMPLE, block: int = 65536) -> int:
+        """(Re)build the IVF index over the current live rows; returns the number of clusters."""
+        started = time.monotonic()
+        snapshot = self._load()
+        if snapshot.matrix is None or not snapshot.live.any():
+            raise ValueError("The vector index is empty")
+        matrix, dim = snapshot.matrix, snapshot.matrix.shape[1]
+        live_rows = np.flatnonzero(snapshot.live)
+        nlist = max(1, min(nlist or int(np.sqrt(len(live_rows))), len(live_rows)))
+        rng = np.random.default_rng(0)
+
+        # Spherical k-means on a sample: centroids are re-normalized means of their rows
+        sample = matrix[np.sort(rng.choice(live_rows, min(sample_size, len(live_rows)), replace=False))]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.concatenate([
+                np.argmax(sample[i:i + block] @ centroids.T, axis=1) for i in range(0, len(sample), block)
+            ])
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.flatnonzero(np.bincount(assignment, minlength=nlist) == 0)
+            sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+            centroids = _normalize(sums).astype(np.float32)
+
+        assignment = np.concatenate([
+            np.argmax(matrix[live_rows[i:i + block]] @ centroids.T, axis=1) for i in range(0, len(live_rows), block)
+        ])
+        order = np.argsort(assignment, kind="stable")
+        ids = live_rows[order]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+
+        # Write beside the live files and swap them in, so readers never see a partial index
+        paths = {name: self._ann_path(name) for name in ("centroids.f32", "offsets.i64", "rows.i64", "vectors.f32")}
+        centroids.tofile(f"{paths['centroids.f32']}.tmp")
+        offsets.tofile(f"{paths['offsets.i64']}.tmp")
+        ids.tofile(f"{paths['rows.i64']}.tmp")
+        with open(f"{paths['vectors.f32']}.tmp", "wb") as f:
+            for i in range(0, len(ids), block):
+                f.write(np.ascontiguousarray(matrix[ids[i:i + block]]).tobytes())
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for path in paths.values():
+                os.replace(f"{path}.tmp", path)
+            meta = self._read_meta(conn)
+            self._write_meta(
+                conn, version=meta.get("version", 0) + 1,
+                ann={"nlist": nlist, "dim": dim, "rows": snapshot.rows, "covered": len(ids)},
+            )
+            conn.execute("COMMIT")
+        logger.info(f"Built IVF index over {len(ids)} vectors with {nlist} clusters in {time.monotonic() - started:.1f}s")
+        return nlist
+
+# Global vector index instance
+vector_index = VectorIndex(config.VECTOR_INDEX_DIR)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the local vector index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build-ann", help="Cluster the index into an approximate (IVF) index")
+    build.add_argument("--nlist", type=int, help="Number of clusters (default: sqrt of the vector count)")
+    build.add_argument("--iterations", type=int, default=config.ANN_TRAIN_ITERATIONS, help="k-means iterations")
+    search = subcommands.add_parser("search", help="Embed a query and print the closest chunks")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=config.SEARCH_TOP_K, help="Number of results")
+    search.add_argument("--exact", action="store_true", help="Scan every vector instead of the IVF index")
+    args = parser.parse_args()
+
+    if args.command == "build-ann":
+        vector_index.build_ann(args.nlist, args.iterations)
+    else:
+        from embedding_engine import embedding_engine
+        results = vector_index.search(embedding_engine.embed_query(args.query), args.k, approximate=False if args.exact else None)
+        for result in results:
+            print(f"{result['score']:.4f}  {result['source']}  {result['snippet'][:100]!r}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 import asyncio
+import hashlib
+import uuid
 import aiohttp
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
 import logging
 from loguru import logger
-from typing import List, Dict, Any
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
 from pathlib import Path
 from config import config
+from http_session import (
+    session_manager, DownloadRejected, STREAMING_TIMEOUT, check_response_headers, decode_body, media_type, read_limited,
+    stream_to_file,
+)
+from fetch_scheduler import fetch_scheduler
+from document_store import has_text, register_file, save_text
+from http_cache import http_cache, CacheEntry
+from html_cleaner import get_cleaner
+from parse_pool import parse_pool
+from pdf_pool import pdf_pool
 import os
 
 # Ensure log directory exists
@@ -23,86 +34,257 @@ except Exception as e:
 
 logger.add(config.LOG_DIR / "web_scraper.log", rotation="1 day", level=config.LOG_LEVEL)
 
+PDF_MAGIC = b"%PDF-"  # Readers accept the header anywhere in the first 1024 bytes
+
+@dataclass
+class FetchResult:
+    """Outcome of a fetch; `cache_entry` holds the validators to store once the body is processed.
+
+    PDF responses are streamed to a temporary file at `pdf_path` instead of being decoded into `text`.
+    `final_url` is where redirects ended, which relative links in `text` resolve against.
+    With `holds_backlog`, `text` came with a parse-pool backlog slot that the caller must release.
+    """
+    text: str = ""
+    not_modified: bool = False
+    cache_entry: Optional[CacheEntry] = None
+    pdf_path: Optional[Path] = None
+    final_url: Optional[str] = None
+    holds_backlog: bool = False
+
+@dataclass
+class ScrapedPage:
+    """Cleaned text of a page and the absolute URLs it links to.
+
+    `text` is None when the page is unchanged since the last scrape and empty
+    when scraping failed; `links` are only collected for HTML pages.
+    `cache_entry` holds the validators that `commit` stores once the page is handled.
+    A PDF's text is not loaded into `text` but extracted to the file at `text_path`.
+    """
+    url: str
+    text: Optional[str]
+    links: List[str]
+    cache_entry: Optional[CacheEntry] = None
+    text_path: Optional[Path] = None
+
+    @property
+    def has_content(self) -> bool:
+        """Whether the page has new text to save."""
+        return bool(self.text or self.text_path)
+
+    def save(self) -> Path | None:
+        """Save the page's text to the output directory; see save_text for the return value.
+
+        An extracted PDF is moved into place and registered rather than read back into memory.
+        """
+        if self.text_path:
+            output_path = config.get_output_path(self.url)
+            self.text_path.replace(output_path)
+            self.text_path = None
+            return register_file(self.url, output_path)
+        return save_text(self.url, self.text)
+
+    def discard(self):
+        """Drop a page that won't be saved, removing its extracted PDF text."""
+        if self.text_path:
+            self.text_path.unlink(missing_ok=True)
+            self.text_path = None
+
+    def commit(self):
+        """Store the page's HTTP validators, so the next scrape revalidates instead of re-fetching.
+
+        Only call this after the page was saved: stored earlier, a failure while
+        saving would turn the retry into a 304 and the update would be lost.
+        """
+        if self.cache_entry:
+            http_cache.store(self.cache_entry)
+
 class WebScraper:
-    def __init__(self):
-        self.session = None
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+    def __init__(self, session: aiohttp.ClientSession | None = None, use_cache: bool = True):
+        self.session = session
+        self.use_cache = use_cache
+        self.cleaner = get_cleaner()
 
     async def init_session(self):
-        """Initialize aiohttp session."""
-        if not self.session:
-            self.session = aiohttp.ClientSession(headers=self.headers)
+        """Attach the shared, pooled aiohttp session for the running event loop."""
+        if not self.session or self.session.closed:
+            self.session = await session_manager.get_session()
 
     async def close_session(self):
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
+        """Release the session reference; the pooled session itself stays open for reuse."""
+        self.session = None
 
-    async def fetch_url(self, url: str) -> str:
-        """Fetch content from URL with retry logic."""
+    async def fetch(self, url: str, hold_backlog: bool = False) -> FetchResult:
+        """Fetch a URL with retry logic, revalidating against the HTTP cache.
+
+        With `hold_backlog`, an HTML body is only read once a parse-pool backlog
+        slot is free, and the slot is handed to the caller with the text.
+        """
+        cached = http_cache.get(url) if self.use_cache else None
+        headers = http_cache.conditional_headers(cached)
         try:
             for attempt in range(config.MAX_RETRIES):
                 try:
-                    async with self.session.get(url, timeout=config.REQUEST_TIMEOUT) as response:
-                        if response.status == 200:
-                            return await response.text()
-                        logger.warning(f"Failed to fetch {url}, attempt {attempt + 1}/{config.MAX_RETRIES}")
+                    async with fetch_scheduler.slot(url):
+                        async with self.session.get(url, headers=headers, timeout=STREAMING_TIMEOUT) as response:
+                            if response.status == 304 and cached:
+                                return FetchResult(not_modified=True)
+                            if response.status == 200:
+                                if media_type(response.headers) in config.PDF_CONTENT_TYPES:
+                                    return await self._fetch_pdf(url, response, cached)
+                                # Leaving the block unread closes the connection instead of draining it
+                                check_response_headers(url, response.headers, config.HTML_CONTENT_TYPES, config.MAX_HTML_BYTES)
+                                if hold_backlog:
+                                    await parse_pool.backlog.acquire()
+                                held = hold_backlog
+                                try:
+                                    # Only PDFs may outlast REQUEST_TIMEOUT; a page must arrive within it
+                                    body = await asyncio.wait_for(read_limited(url, response, config.MAX_HTML_BYTES), config.REQUEST_TIMEOUT)
+                                    body_hash = hashlib.sha256(body).hexdigest()
+                                    if cached and cached.body_hash == body_hash:
+                                        # Server ignored the validators but the body is unchanged
+                                        return FetchResult(not_modified=True)
+                                    entry = self._cache_entry(url, response, body_hash)
+                                    if PDF_MAGIC in body[:1024]:
+                                        # A PDF served without a PDF content type
+                                        pdf_path = self._temp_path('.pdf')
+                                        pdf_path.write_bytes(body)
+                                        return FetchResult(cache_entry=entry, pdf_path=pdf_path)
+                                    text = decode_body(response, body)
+                                    held = False  # Handed over with the text
+                                    return FetchResult(text=text, cache_entry=entry, final_url=str(response.url),
+                                                       holds_backlog=hold_backlog)
+                                finally:
+                                    if held:
+                                        parse_pool.backlog.release()
+                    logger.warning(f"Failed to fetch {url}, attempt {attempt + 1}/{config.MAX_RETRIES}")
+                except DownloadRejected as e:
+                    logger.warning(f"Skipping {url}: {e}")
+                    return FetchResult()
                 except Exception as e:
                     logger.error(f"Error fetching {url}: {str(e)}")
                     await asyncio.sleep(2 ** attempt)  # Exponential backoff
-            return ""
+            return FetchResult()
         except Exception as e:
             logger.error(f"Fatal error fetching {url}: {str(e)}")
-            return ""
+            return FetchResult()
+
+    def _cache_entry(self, url: str, response: aiohttp.ClientResponse, body_hash: str) -> CacheEntry:
+        return CacheEntry(url, response.headers.get('ETag'), response.headers.get('Last-Modified'), body_hash)
+
+    def _temp_path(self, suffix: str) -> Path:
+        os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+        return config.OUTPUT_DIR / f"temp_{uuid.uuid4()}{suffix}"
+
+    async def _fetch_pdf(self, url: str, response: aiohttp.ClientResponse, cached: Optional[CacheEntry]) -> FetchResult:
+        """Stream a PDF response to a temporary file for the PDF pool."""
+        check_response_headers(url, response.headers, config.PDF_CONTENT_TYPES, config.MAX_PDF_BYTES)
+        pdf_path = self._temp_path('.pdf')
+        # Aborts after the first chunk when e.g. an application/octet-stream download isn't a PDF
+        body_hash = await stream_to_file(url, response, pdf_path, config.MAX_PDF_BYTES, signature=PDF_MAGIC)
+        if cached and cached.body_hash == body_hash:
+            pdf_path.unlink(missing_ok=True)
+            return FetchResult(not_modified=True)
+        return FetchResult(cache_entry=self._cache_entry(url, response, body_hash), pdf_path=pdf_path)
+
+    async def extract_pdf(self, url: str, pdf_path: Path) -> Path | None:
+        """Extract a downloaded PDF's text in the PDF pool, removing the temporary PDF.
+
+        The text is streamed to a temporary file in the output directory, which is
+        returned, or None if extraction failed or found no text.
+        """
+        # Not *.txt, so nothing mistakes it for a saved document before it is moved into place
+        text_path = self._temp_path('.txt.part')
+        try:
+            logger.info(f"{url} is a PDF; extracting it in the PDF pool")
+            pages = await asyncio.to_thread(pdf_pool.extract_to_file, str(pdf_path), text_path)
+            if has_text(text_path):
+                logger.info(f"Extracted {pages} pages from {url}")
+                return text_path
+            logger.warning(f"No text could be extracted from {url}.")
+        except Exception as e:
+            logger.error(f"Failed to extract PDF from {url}: {e}")
+        finally:
+            pdf_path.unlink(missing_ok=True)
+        text_path.unlink(missing_ok=True)
+        return None
+
+    async def fetch_url(self, url: str) -> str:
+        """Fetch content from URL with retry logic."""
+        return (await self.fetch(url)).text
 
     def clean_html(self, html: str) -> str:
         """Clean HTML content by removing boilerplate elements."""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Remove common boilerplate elements
-        for elem in soup(['script', 'style', 'nav', 'footer', 'header']):
-            elem.decompose()
-            
-        # Remove ads and other non-content elements
-        for elem in soup.find_all(class_=lambda x: x and ('ad' in x.lower() or 'banner' in x.lower())):
-            elem.decompose()
-            
-        # Get text content
-        text = soup.get_text(separator='\n', strip=True)
-        return text
-
-    async def scrape_url(self, url: str) -> str:
-        """Scrape and clean content from a URL."""
+        return self.cleaner.clean(html)
+
+    async def scrape_url(self, url: str) -> str | None:
+        """Scrape and clean content from a URL. Returns None if it is unchanged since the last scrape.
+
+        The validators are stored right away; to store them only once the text
+        is saved, use scrape_page and commit the page.
+        """
+        page = await self.scrape_page(url)
+        page.commit()
+        if page.text_path:
+            try:
+                return page.text_path.read_text(encoding='utf-8', errors='ignore')
+            finally:
+                page.text_path.unlink(missing_ok=True)
+        return page.text
+
+    async def scrape_page(self, url: str, with_links: bool = False) -> ScrapedPage:
+        """Scrape and clean a URL, also collecting the page's links when `with_links` is set."""
         logger.info(f"Scraping URL: {url}")
-        html = await self.fetch_url(url)
-        if not html:
-            logger.error(f"Failed to scrape {url}")
-            return ""
-            
-        cleaned_text = self.clean_html(html)
+        links = []
+        # A backlog slot covers body read through parse, so bodies waiting on the parse pool stay bounded
+        result = await self.fetch(url, hold_backlog=True)
+        if result.not_modified:
+            logger.info(f"{url} not modified since the last scrape; skipping.")
+            return ScrapedPage(url, None, [])
+        if result.pdf_path:
+            # PDFs go to the PDF pool instead of the HTML cleaner
+            text_path = await self.extract_pdf(url, result.pdf_path)
+            if not text_path:
+                return ScrapedPage(url, "", [])
+            logger.info(f"Successfully scraped {url}")
+            return ScrapedPage(url, "", [], result.cache_entry, text_path)
+        try:
+            html = result.text
+            if not html:
+                logger.error(f"Failed to scrape {url}")
+                return ScrapedPage(url, "", [])
+
+            # Parse in the worker pool so other fetches on this loop keep going
+            if with_links:
+                url = result.final_url or url
+                cleaned_text, links = await parse_pool.clean_with_links(html, url, self.cleaner.name)
+            else:
+                cleaned_text = await parse_pool.clean(html, self.cleaner.name)
+        finally:
+            if result.holds_backlog:
+                parse_pool.backlog.release()
         logger.info(f"Successfully scraped {url}")
-        return cleaned_text
+        return ScrapedPage(url, cleaned_text, links, result.cache_entry)
 
-    async def scrape_urls(self, urls: List[str]) -> Dict[str, str]:
-        """Scrape multiple URLs concurrently."""
-        tasks = [self.scrape_url(url) for url in urls]
+    async def scrape_urls(self, urls: List[str]) -> Dict[str, ScrapedPage]:
+        """Scrape multiple URLs concurrently, bounded by the fetch scheduler; commit each page once saved."""
+        tasks = [self.scrape_page(url) for url in urls]
         results = await asyncio.gather(*tasks)
         return dict(zip(urls, results))
 
 async def scrape_and_save_url(url: str) -> Path | None:
     """Scrapes a single URL, saves its content, and returns the output path."""
-    scraper = WebScraper()
-    await scraper.init_session()
+    scraper = WebScraper(await session_manager.get_session())
     try:
-        content = await scraper.scrape_url(url)
-        if content:
-            output_path = config.get_output_path(url)
-            # Ensure the output directory exists
-            os.makedirs(output_path.parent, exist_ok=True)
-            output_path.write_text(content, encoding='utf-8')
-            logger.info(f"Saved content from {url} to {output_path}")
+        page = await scraper.scrape_page(url)
+        if page.text is None:
+            # Unchanged since the last scrape: nothing to write or ingest
+            return None
+        if page.has_content:
+            # Skips the write (and so the upload) when identical content was already ingested
+            output_path = await asyncio.to_thread(page.save)
+            page.commit()
+            if output_path:
+                logger.info(f"Saved content from {url} to {output_path}")
             return output_path
         else:
             logger.error(f"No content scraped from {url}, not saving file.")
@@ -110,8 +292,6 @@ async def scrape_and_save_url(url: str) -> Path | None:
     except Exception as e:
         logger.critical(f"An unexpected error occurred while processing {url}: {e}")
         return None
-    finally:
-        await scraper.close_session()
 
 async def main():
     """Example usage of WebScraper for standalone execution."""
@@ -120,7 +300,10 @@ async def main():
         "https://en.wikipedia.org/wiki/Debian"
     ]
     tasks = [scrape_and_save_url(url) for url in urls]
-    results = await asyncio.gather(*tasks)
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        await session_manager.close()
     for url, success in zip(urls, results):
         if success:
             logger.info(f"Successfully processed {url}")